@@ -0,0 +1,87 @@
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from Controllers.metrics_controllers import resolve_project_dir, extract_uploaded_archive
+from Services import job_service
+from typing import List, Optional
+import asyncio
+import json
+
+# Seconds between polls of a job's event buffer while streaming
+EVENT_POLL_INTERVAL = 0.5
+
+
+def _submit(project_dir_to_use, ignore_dirs, output_dir, tmpdir):
+    ignore_set = set(map(str.strip, ignore_dirs.split(",")))
+    # The job removes tmpdir (uploaded sources) once it has finished
+    job_id = job_service.submit_job(project_dir_to_use, ignore_set, output_dir, cleanup_dir=tmpdir)
+    return {"job_id": job_id, "status": job_service.QUEUED, "status_url": f"/api/jobs/{job_id}"}
+
+
+async def create_job_controller(
+    project_dir: Optional[str],
+    ignore_dirs: str,
+    output_dir: str,
+    uploaded: Optional[str],
+    project_files: Optional[List[UploadFile]],
+):
+    try:
+        project_dir_to_use, tmpdir = resolve_project_dir(project_dir, uploaded, project_files)
+        return _submit(project_dir_to_use, ignore_dirs, output_dir, tmpdir)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating job: {str(e)}")
+
+
+async def create_archive_job_controller(archive: UploadFile, ignore_dirs: str, output_dir: str):
+    try:
+        tmpdir = await run_in_threadpool(extract_uploaded_archive, archive)
+        return _submit(tmpdir, ignore_dirs, output_dir, tmpdir)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating job: {str(e)}")
+
+
+async def get_job_controller(job_id: str):
+    job = job_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+async def cancel_job_controller(job_id: str):
+    job = job_service.cancel_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+async def job_events_controller(job_id: str, last_event_id: Optional[str] = None):
+    """Stream a job's progress events as Server-Sent Events until it ends.
+    Clients reconnecting with Last-Event-ID resume after that event."""
+    try:
+        last_seq = int(last_event_id) if last_event_id else 0
+    except ValueError:
+        last_seq = 0
+    if job_service.events_since(job_id, last_seq) is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    async def stream():
+        seq = last_seq
+        while True:
+            polled = job_service.events_since(job_id, seq)
+            if polled is None:
+                return
+            events, finished = polled
+            for seq, event in events:
+                yield f"id: {seq}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            if finished:
+                return
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
@@ -1,27 +1,24 @@
 from fastapi import Form, HTTPException, UploadFile
-from Services.metrics_services import analyze_metrics
-import tempfile
+from starlette.concurrency import run_in_threadpool
+from Services.metrics_services import analyze_metrics, run_variables
+from Services import upload_service
 import os
 import shutil
 from typing import List, Optional
 
 
-async def analyze_controller(
-    project_dir: Optional[str] = Form(None),
-    ignore_dirs: str = Form("node_modules,dist,build,.next"),
-    output_dir: str = Form("reports"),
-    uploaded: Optional[str] = Form(None),
-    project_files: Optional[List[UploadFile]] = None,
-):
-    try:
-        # If files were uploaded, save them to a temp directory and analyze that.
-        if uploaded and project_files:
-            tmpdir = tempfile.mkdtemp(prefix="qualitas_upload_")
+def resolve_project_dir(project_dir, uploaded, project_files):
+    """Return ``(directory to analyze, temp dir to remove afterwards)``: the
+    uploaded files saved to a temp directory, or the server-side project_dir
+    with no temp dir."""
+    # If files were uploaded, save them to a temp directory and analyze that.
+    if uploaded and project_files:
+        tmpdir = upload_service.make_upload_dir()
+        try:
             for up in project_files:
                 # Sanitize filename to prevent directory traversal
-                filename = up.filename.replace("\\", "/")
-                filename = os.path.normpath(filename)
-                if filename.startswith("..") or os.path.isabs(filename):
+                filename = upload_service.safe_relpath(up.filename)
+                if filename is None:
                     # skip suspicious files
                     continue
 
@@ -32,20 +29,77 @@ async def analyze_controller(
 
                 with open(dest_path, "wb") as f:
                     shutil.copyfileobj(up.file, f)
+        except Exception:
+            upload_service.remove_upload_dir(tmpdir)
+            raise
+
+        return tmpdir, tmpdir
+
+    if not project_dir:
+        raise HTTPException(status_code=400, detail="Project directory path is required.")
+    return project_dir, None
+
+
+def extract_uploaded_archive(archive: UploadFile):
+    """Stream-extract an uploaded .zip/.tar.gz into a temp directory and
+    return it. Raises HTTP 400 for bad archives or exceeded limits."""
+    tmpdir = upload_service.make_upload_dir()
+    try:
+        count = upload_service.extract_archive(archive.file, archive.filename, tmpdir)
+    except upload_service.ArchiveError as e:
+        upload_service.remove_upload_dir(tmpdir)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        upload_service.remove_upload_dir(tmpdir)
+        raise
+    if count == 0:
+        upload_service.remove_upload_dir(tmpdir)
+        raise HTTPException(status_code=400, detail="Archive contains no recognized source files.")
+    return tmpdir
+
+
+async def _analyze(project_dir_to_use, ignore_dirs, output_dir, tmpdir):
+    ignore_set = set(map(str.strip, ignore_dirs.split(",")))
+    try:
+        # The analysis is synchronous; run it off the event loop so other
+        # requests are still served meanwhile.
+        return await run_in_threadpool(analyze_metrics, project_dir_to_use, ignore_set, output_dir)
+    finally:
+        upload_service.remove_upload_dir(tmpdir)
+
 
-            project_dir_to_use = tmpdir
+async def analyze_controller(
+    project_dir: Optional[str] = Form(None),
+    ignore_dirs: str = Form("node_modules,dist,build,.next"),
+    output_dir: str = Form("reports"),
+    uploaded: Optional[str] = Form(None),
+    project_files: Optional[List[UploadFile]] = None,
+):
+    try:
+        project_dir_to_use, tmpdir = resolve_project_dir(project_dir, uploaded, project_files)
+        return await _analyze(project_dir_to_use, ignore_dirs, output_dir, tmpdir)
 
-        else:
-            if not project_dir:
-                raise HTTPException(status_code=400, detail="Project directory path is required.")
-            project_dir_to_use = project_dir
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error during analysis: {str(e)}")
 
-        ignore_set = set(map(str.strip, ignore_dirs.split(",")))
-        result = analyze_metrics(project_dir_to_use, ignore_set, output_dir)
 
-        return result
+async def analyze_archive_controller(archive: UploadFile, ignore_dirs: str, output_dir: str):
+    try:
+        tmpdir = await run_in_threadpool(extract_uploaded_archive, archive)
+        return await _analyze(tmpdir, ignore_dirs, output_dir, tmpdir)
 
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error during analysis: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error during analysis: {str(e)}")
+
+
+async def variables_controller(run_id: str, file: Optional[str] = None, offset: int = 0, limit: int = 500):
+    if offset < 0 or limit < 1 or limit > 5000:
+        raise HTTPException(status_code=400, detail="offset must be >= 0 and limit between 1 and 5000.")
+    result = run_variables(run_id, file, offset, limit)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Run or file not found.")
+    return result
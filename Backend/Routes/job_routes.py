@@ -0,0 +1,57 @@
+from typing import List, Optional
+from fastapi import APIRouter, Form, File, Header, UploadFile
+from Controllers.job_controllers import (
+    create_job_controller,
+    create_archive_job_controller,
+    get_job_controller,
+    cancel_job_controller,
+    job_events_controller,
+)
+
+router = APIRouter()
+
+
+@router.post("/jobs")
+async def create_job_route(
+    project_dir: Optional[str] = Form(None),
+    ignore_dirs: str = Form("node_modules,dist,build,.next"),
+    output_dir: str = Form("reports"),
+    uploaded: Optional[str] = Form(None),
+    project_files: Optional[List[UploadFile]] = File(None),
+):
+    """Queue an analysis (same form fields as /analyze/) and return its job
+    id immediately. Poll /jobs/{job_id} for status and results.
+    """
+    return await create_job_controller(project_dir, ignore_dirs, output_dir, uploaded, project_files)
+
+
+@router.post("/jobs/archive")
+async def create_archive_job_route(
+    archive: UploadFile = File(...),
+    ignore_dirs: str = Form("node_modules,dist,build,.next"),
+    output_dir: str = Form("reports"),
+):
+    """Queue an analysis of a single uploaded .zip or .tar.gz. Only source
+    files with recognized extensions are extracted.
+    """
+    return await create_archive_job_controller(archive, ignore_dirs, output_dir)
+
+
+@router.get("/jobs/{job_id}")
+async def get_job_route(job_id: str):
+    """Status of a job, with the analysis result once it has succeeded."""
+    return await get_job_controller(job_id)
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job_route(job_id: str):
+    """Cancel a queued job, or stop a running one after its current file."""
+    return await cancel_job_controller(job_id)
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events_route(job_id: str, last_event_id: Optional[str] = Header(None)):
+    """Server-Sent Events stream of a job's progress: phase start/end,
+    files done/total with throughput and ETA, and a final job_end event.
+    """
+    return await job_events_controller(job_id, last_event_id)
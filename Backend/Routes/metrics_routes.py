@@ -1,6 +1,6 @@
 from typing import List, Optional
 from fastapi import APIRouter, Form, File, UploadFile
-from Controllers.metrics_controllers import analyze_controller
+from Controllers.metrics_controllers import analyze_controller, analyze_archive_controller, variables_controller
 
 router = APIRouter()
 
@@ -17,4 +17,31 @@ async def analyze_route(
     or uploaded files. If files are uploaded, they will be saved to a temporary
     directory and passed to the analysis controller as the project_dir.
     """
-    return await analyze_controller(project_dir, ignore_dirs, output_dir, uploaded, project_files)
\ No newline at end of file
+    return await analyze_controller(project_dir, ignore_dirs, output_dir, uploaded, project_files)
+
+
+@router.post("/analyze/archive")
+async def analyze_archive_route(
+    archive: UploadFile = File(...),
+    ignore_dirs: str = Form("node_modules,dist,build,.next"),
+    output_dir: str = Form("reports"),
+):
+    """Analyze a project uploaded as one .zip or .tar.gz. Only source files
+    with recognized extensions are extracted, size limits are enforced while
+    extracting, and the temporary directory is removed afterwards.
+    """
+    return await analyze_archive_controller(archive, ignore_dirs, output_dir)
+
+
+@router.get("/results/{run_id}/variables")
+async def variables_route(
+    run_id: str,
+    file: Optional[str] = None,
+    offset: int = 0,
+    limit: int = 500,
+):
+    """Live variables of a finished run, served page by page. Without
+    ``file`` this lists the analyzed files; with it, returns ``limit`` lines
+    of that file starting after ``offset``.
+    """
+    return await variables_controller(run_id, file, offset, limit)
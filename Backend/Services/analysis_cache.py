@@ -0,0 +1,177 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import sqlite3
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+# The manifest includes the per-file analyzer version
+METRICS_PATH = os.path.abspath(os.path.join(CURRENT_DIR, "..", "..", "Metrics", "PY"))
+if METRICS_PATH not in sys.path:
+    sys.path.append(METRICS_PATH)
+
+from result_cache import ANALYZER_VERSION
+
+CACHE_DIR = os.getenv("QUALITAS_ANALYSIS_CACHE_DIR", os.path.join(CURRENT_DIR, "..", "analysis_cache"))
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+# Eviction bounds; least recently used entries go first
+MAX_ENTRIES = _env_int("QUALITAS_ANALYSIS_CACHE_MAX_ENTRIES", 500)
+MAX_BYTES = _env_int("QUALITAS_ANALYSIS_CACHE_MAX_BYTES", 1024 * 1024 * 1024)
+
+
+def manifest_hash(index, options):
+    """Hash of the analyzed project: every indexed file's relative path and
+    content hash, plus the analyzer version and the options that change the
+    output. Identical uploads of one commit give the same hash regardless of
+    where they were extracted."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({"version": ANALYZER_VERSION, **options}, sort_keys=True).encode())
+    for entry in sorted(index, key=lambda f: os.path.relpath(f.path, index.root)):
+        relpath = os.path.relpath(entry.path, index.root).replace(os.sep, "/")
+        file_hash = hashlib.sha256()
+        with open(entry.path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                file_hash.update(chunk)
+        digest.update(relpath.encode("utf-8", "surrogateescape"))
+        digest.update(b"\0")
+        digest.update(file_hash.digest())
+    return digest.hexdigest()
+
+
+def _rebase(obj, old, new):
+    """Rewrite path strings under ``old`` to live under ``new``."""
+    if isinstance(obj, str):
+        if obj == old or obj.startswith(old + os.sep):
+            return new + obj[len(old):]
+        return obj
+    if isinstance(obj, dict):
+        return {k: _rebase(v, old, new) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_rebase(v, old, new) for v in obj]
+    return obj
+
+
+def _report_files(obj, output_dir):
+    """Existing files under output_dir referenced anywhere in a response."""
+    if isinstance(obj, str):
+        if obj.startswith(output_dir + os.sep) and os.path.isfile(obj):
+            yield obj
+    elif isinstance(obj, dict):
+        for v in obj.values():
+            yield from _report_files(v, output_dir)
+    elif isinstance(obj, list):
+        for v in obj:
+            yield from _report_files(v, output_dir)
+
+
+class AnalysisCache:
+    """Analyze responses and their report files, keyed by manifest hash.
+
+    The index lives in SQLite and the reports in one directory per entry
+    under CACHE_DIR, so every worker process of the server shares it.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self._db = os.path.join(cache_dir, "index.db")
+
+    def _connect(self):
+        conn = sqlite3.connect(self._db, timeout=30)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "manifest TEXT PRIMARY KEY, response TEXT NOT NULL, output_dir TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        return conn
+
+    def _entry_dir(self, manifest):
+        return os.path.join(self.cache_dir, manifest)
+
+    def get(self, manifest, output_dir, project_dir):
+        """Return the cached response for ``manifest`` with its reports copied
+        into ``output_dir``, or None on a miss."""
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute(
+                    "SELECT response, output_dir FROM entries WHERE manifest = ?", (manifest,)
+                ).fetchone()
+                if not row:
+                    return None
+                conn.execute("UPDATE entries SET last_access = ? WHERE manifest = ?",
+                             (time.time(), manifest))
+        finally:
+            conn.close()
+
+        # A concurrent put or eviction may replace or delete the entry while
+        # it is copied; that is a miss like any other
+        try:
+            shutil.copytree(self._entry_dir(manifest), output_dir, dirs_exist_ok=True)
+        except OSError:
+            return None
+
+        response = json.loads(row[0])
+        response = _rebase(response, row[1], output_dir)
+        response["project_dir"] = project_dir
+        return response
+
+    def put(self, manifest, output_dir, response):
+        entry_dir = self._entry_dir(manifest)
+        # Jobs run on threads of one process, so the name has to be unique
+        # per call, not per process
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(entry_dir),
+                                   prefix=f"{os.path.basename(entry_dir)}.", suffix=".tmp")
+        try:
+            # Only the reports of this run: output_dir may hold older ones too
+            size = 0
+            for path in set(_report_files(response, output_dir)):
+                dest = os.path.join(tmp_dir, os.path.relpath(path, output_dir))
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                shutil.copyfile(path, dest)
+                size += os.path.getsize(dest)
+
+            conn = self._connect()
+            try:
+                with conn:
+                    # Take the write lock first so concurrent workers storing the
+                    # same manifest do not race on the entry directory
+                    conn.execute("BEGIN IMMEDIATE")
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                    os.replace(tmp_dir, entry_dir)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO entries (manifest, response, output_dir, size, last_access) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (manifest, json.dumps(response), output_dir, size, time.time()),
+                    )
+                    self._evict(conn)
+            finally:
+                conn.close()
+        finally:
+            # Left behind only when the entry was not published
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _evict(self, conn):
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= MAX_ENTRIES and total <= MAX_BYTES:
+            return
+        for manifest, size in conn.execute(
+            "SELECT manifest, size FROM entries ORDER BY last_access"
+        ).fetchall():
+            if count <= MAX_ENTRIES and total <= MAX_BYTES:
+                break
+            conn.execute("DELETE FROM entries WHERE manifest = ?", (manifest,))
+            shutil.rmtree(self._entry_dir(manifest), ignore_errors=True)
+            count -= 1
+            total -= size
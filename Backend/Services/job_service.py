@@ -0,0 +1,171 @@
+import os
+import time
+import uuid
+import shutil
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from Services.metrics_services import analyze_metrics
+from Services import prometheus
+from progress import ProgressBus, RateLimitedSink, console_sink
+
+try:
+    JOB_WORKERS = max(1, int(os.getenv("QUALITAS_JOB_WORKERS", "2")))
+except ValueError:
+    JOB_WORKERS = 2
+# Finished jobs kept for status lookups before the oldest are dropped
+MAX_FINISHED_JOBS = 200
+# Progress events buffered per job for the events stream
+MAX_JOB_EVENTS = 1000
+# Also print rate-limited progress to the server console when enabled
+CONSOLE_PROGRESS = os.getenv("QUALITAS_CONSOLE_PROGRESS", "").lower() in ("1", "true", "yes")
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+_FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="qualitas-job")
+_jobs = OrderedDict()
+_lock = threading.Lock()
+
+
+class Job:
+    def __init__(self, project_dir, ignore_dirs, output_dir, cleanup_dir=None):
+        self.id = uuid.uuid4().hex
+        self.project_dir = project_dir
+        self.ignore_dirs = ignore_dirs
+        self.output_dir = output_dir
+        self.cleanup_dir = cleanup_dir
+        self.status = QUEUED
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.events = deque(maxlen=MAX_JOB_EVENTS)
+        self._event_seq = 0
+        self.progress = ProgressBus(RateLimitedSink(self._record_event, min_interval=0.25))
+        if CONSOLE_PROGRESS:
+            self.progress.subscribe(console_sink())
+
+    def _record_event(self, event):
+        with _lock:
+            self._event_seq += 1
+            self.events.append((self._event_seq, event))
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "project_dir": self.project_dir,
+            "output_dir": self.output_dir,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error,
+            "result": self.result,
+        }
+
+
+def _finish(job, status, result=None, error=None):
+    if job.cleanup_dir:
+        shutil.rmtree(job.cleanup_dir, ignore_errors=True)
+    job.progress.emit("job_end", status=status, error=error)
+    with _lock:
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished = time.time()
+        finished = [j for j in _jobs.values() if j.status in _FINISHED]
+        for old in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del _jobs[old.id]
+
+
+def _run(job):
+    with _lock:
+        if job.cancel_event.is_set():
+            return
+        job.status = RUNNING
+        job.started = time.time()
+    job.progress.emit("job_start", job_id=job.id)
+
+    try:
+        result = analyze_metrics(job.project_dir, job.ignore_dirs, job.output_dir,
+                                 cancel_event=job.cancel_event, progress=job.progress)
+    except Exception as e:
+        _finish(job, FAILED, error=str(e))
+        return
+
+    if job.cancel_event.is_set():
+        _finish(job, CANCELLED)
+    elif result.get("status") == "success":
+        _finish(job, SUCCEEDED, result=result)
+    else:
+        _finish(job, FAILED, error=result.get("message"))
+
+
+def submit_job(project_dir, ignore_dirs, output_dir, cleanup_dir=None):
+    """Queue an analysis on the worker pool and return the job id.
+    ``cleanup_dir`` (e.g. extracted uploads) is deleted when the job ends,
+    whether it succeeds, fails or is cancelled."""
+    job = Job(project_dir, ignore_dirs, output_dir, cleanup_dir)
+    with _lock:
+        _jobs[job.id] = job
+    job.future = _executor.submit(_run, job)
+    prometheus.QUEUE_DEPTH.observe(queue_depth())
+    return job.id
+
+
+def get_job(job_id):
+    with _lock:
+        job = _jobs.get(job_id)
+        return job.to_dict() if job else None
+
+
+def cancel_job(job_id):
+    """Cancel a queued job outright, or ask a running one to stop after the
+    file it is analyzing. Returns the job state, or None if unknown."""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        if job.status in _FINISHED:
+            return job.to_dict()
+        job.cancel_event.set()
+        queued = job.status == QUEUED
+
+    if queued:
+        # _run checks the event under the lock, so a queued job never starts
+        if job.future is not None:
+            job.future.cancel()
+        _finish(job, CANCELLED)
+    return get_job(job_id)
+
+
+def events_since(job_id, last_seq=0):
+    """Return ``(events, finished)`` where events are the ``(seq, event)``
+    pairs recorded after ``last_seq``, or None if the job is unknown."""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        events = [(seq, e) for seq, e in job.events if seq > last_seq]
+        return events, job.status in _FINISHED
+
+
+def queue_depth():
+    with _lock:
+        return sum(1 for j in _jobs.values() if j.status == QUEUED)
+
+
+def running_jobs():
+    with _lock:
+        return sum(1 for j in _jobs.values() if j.status == RUNNING)
+
+
+prometheus.register(prometheus.Gauge("qualitas_jobs_queued", "Analysis jobs waiting for a worker.",
+                                     queue_depth))
+prometheus.register(prometheus.Gauge("qualitas_jobs_running", "Analysis jobs being analyzed.",
+                                     running_jobs))
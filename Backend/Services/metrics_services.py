@@ -5,25 +5,118 @@ CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "../..")) 
 sys.path.append(PROJECT_ROOT)
 
-from quality_metrics import run_quality_metrics
+from quality_metrics import run_quality_metrics, project_index
+from timings import Timings, timing_phase
+from Services import results_store
+from Services.analysis_cache import AnalysisCache, manifest_hash
 
+LIVE_FORMAT = "ranges"
+# Per-phase and slowest-file timings in the analyze response
+TIMINGS = os.getenv("QUALITAS_TIMINGS", "true").lower() in ("1", "true", "yes")
+# Sketch-estimated project n1/n2 for very large projects (bounded memory)
+APPROXIMATE = os.getenv("QUALITAS_APPROXIMATE", "false").lower() in ("1", "true", "yes")
+_analysis_cache = None
 
-def analyze_metrics(project_dir: str, ignore_dirs: set, output_dir: str):
+
+def _get_analysis_cache():
+    # Created lazily so importing the service does not touch the disk
+    global _analysis_cache
+    if _analysis_cache is None:
+        _analysis_cache = AnalysisCache()
+    return _analysis_cache
+
+
+def _summarize(results):
+    """Replace the operator/operand maps with counts so the response stays
+    small; the full data lives in the CSV reports and the results store."""
+    summary = {}
+    for lang, res in results.items():
+        if not isinstance(res, dict):
+            continue
+        entry = {k: v for k, v in res.items() if k not in ("total_ops", "total_opnds")}
+        if "total_ops" in res:
+            ops, opnds = res.get("total_ops") or {}, res.get("total_opnds") or {}
+            entry["operators"] = {"distinct": len(ops), "total": sum(ops.values())}
+            entry["operands"] = {"distinct": len(opnds), "total": sum(opnds.values())}
+        if "halstead_estimate" in res:
+            estimate = entry.pop("halstead_estimate")
+            entry["operators"] = {"distinct": estimate["n1"], "distinct_error": estimate["n1_error"],
+                                  "total": estimate["N1"]}
+            entry["operands"] = {"distinct": estimate["n2"], "distinct_error": estimate["n2_error"],
+                                 "total": estimate["N2"]}
+        summary[lang] = entry
+    return summary
+
+
+def analyze_metrics(project_dir: str, ignore_dirs: set, output_dir: str, cancel_event=None, progress=None):
     try:
         os.makedirs(output_dir, exist_ok=True)
         print(f"Running quality analysis on: {project_dir}")
-        results = run_quality_metrics(project_dir, ignore_dirs, output_dir)
+        timings = Timings() if TIMINGS else None
+        with timing_phase(timings, "walk"):
+            index = project_index.ProjectIndex.build(project_dir, ignore_dirs)
 
-        return {
+        # Projects whose files (relative path + content) were analyzed before
+        # get the stored response back instead of a new analysis.
+        cache = _get_analysis_cache()
+        with timing_phase(timings, "manifest"):
+            manifest = manifest_hash(index, {"ignore_dirs": sorted(ignore_dirs), "live_format": LIVE_FORMAT,
+                                            "approximate": APPROXIMATE})
+        cached = cache.get(manifest, output_dir, project_dir)
+        if cached is not None:
+            print(f"Reusing cached analysis {manifest[:12]} for: {project_dir}")
+            cached["cached"] = True
+            if timings is not None:
+                cached["timings"] = timings.to_dict()
+            return cached
+
+        # Range-encoded live variables keep the report small and are what the
+        # results store loads for the paginated variables endpoint.
+        results = run_quality_metrics(project_dir, ignore_dirs, output_dir, live_format=LIVE_FORMAT,
+                                      cancel_event=cancel_event, progress=progress, index=index,
+                                      timings=timings, approximate=APPROXIMATE)
+        summary = _summarize(results)
+
+        combined = results.get("combined", {})
+        run_id = results_store.save_run(project_dir, output_dir, summary,
+                                        combined.get("live_variables_csv"))
+
+        response = {
             "status": "success",
             "project_dir": project_dir,
             "output_dir": output_dir,
             "message": "All metrics computed successfully!",
-            "results": results,
+            "run_id": run_id,
+            "variables_url": f"/api/results/{run_id}/variables",
+            "manifest": manifest,
+            "results": summary,
         }
+        try:
+            cache.put(manifest, output_dir, response)
+        except Exception as e:
+            # A failed cache write must not fail an analysis that succeeded
+            print(f"Could not cache analysis {manifest[:12]}: {e}")
+        response["cached"] = False
+        # Timings describe this run only, so they are not part of the cached response
+        if timings is not None:
+            response["timings"] = timings.to_dict()
+        return response
 
     except Exception as e:
         return {
             "status": "error",
             "message": str(e)
-        }
\ No newline at end of file
+        }
+
+
+def run_variables(run_id: str, file=None, offset: int = 0, limit: int = 500):
+    """Page through a stored run's live variables: the file list when no
+    ``file`` is given, otherwise the per-line variables of that file."""
+    if results_store.get_run(run_id) is None:
+        return None
+    if file is None:
+        return {"run_id": run_id, **results_store.list_variable_files(run_id, offset, limit)}
+    data = results_store.get_file_variables(run_id, file, offset, limit)
+    if data is None:
+        return None
+    return {"run_id": run_id, **data}
@@ -0,0 +1,190 @@
+import os
+import csv
+import json
+import time
+import uuid
+import sqlite3
+from bisect import insort
+from collections import defaultdict
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DB = os.getenv("QUALITAS_RESULTS_DB", os.path.join(CURRENT_DIR, "..", "qualitas_results.db"))
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+# Retention of saved runs, applied whenever a run is saved; 0 turns a
+# bound off
+MAX_RUNS = _env_int("QUALITAS_RESULTS_MAX_RUNS", 200)
+MAX_AGE_SEC = _env_int("QUALITAS_RESULTS_MAX_AGE_SEC", 7 * 24 * 3600)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    project_dir TEXT,
+    output_dir TEXT,
+    summary TEXT
+);
+CREATE TABLE IF NOT EXISTS live_files (
+    run_id TEXT NOT NULL,
+    file TEXT NOT NULL,
+    line_count INTEGER NOT NULL,
+    PRIMARY KEY (run_id, file)
+);
+CREATE TABLE IF NOT EXISTS live_ranges (
+    run_id TEXT NOT NULL,
+    file TEXT NOT NULL,
+    variable TEXT NOT NULL,
+    first_line INTEGER NOT NULL,
+    last_line INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS live_ranges_file ON live_ranges (run_id, file, first_line);
+"""
+
+
+def _connect():
+    conn = sqlite3.connect(RESULTS_DB, timeout=30)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _purge(conn, now):
+    """Delete runs beyond MAX_RUNS (oldest first) or older than MAX_AGE_SEC,
+    with their live variable rows."""
+    expired = set()
+    if MAX_AGE_SEC > 0:
+        expired.update(r[0] for r in conn.execute(
+            "SELECT run_id FROM runs WHERE created < ?", (now - MAX_AGE_SEC,)))
+    if MAX_RUNS > 0:
+        expired.update(r[0] for r in conn.execute(
+            "SELECT run_id FROM runs ORDER BY created DESC LIMIT -1 OFFSET ?", (MAX_RUNS,)))
+    for run_id in expired:
+        for table in ("live_ranges", "live_files", "runs"):
+            conn.execute(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
+
+
+def save_run(project_dir, output_dir, summary, live_ranges_csv=None):
+    """Persist a finished analysis and return its run id.
+
+    ``live_ranges_csv`` is a range-encoded live variable report; its rows are
+    loaded so per-line variables can be served page by page later. Runs past
+    the retention limits are deleted in the same transaction.
+    """
+    run_id = uuid.uuid4().hex
+    now = time.time()
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO runs (run_id, created, project_dir, output_dir, summary) VALUES (?, ?, ?, ?, ?)",
+                (run_id, now, project_dir, output_dir, json.dumps(summary)),
+            )
+            if live_ranges_csv and os.path.exists(live_ranges_csv):
+                with open(live_ranges_csv, "r", newline="", encoding="utf-8") as f:
+                    reader = csv.DictReader(f)
+                    for row in reader:
+                        if row["Variable"]:
+                            conn.execute(
+                                "INSERT INTO live_ranges VALUES (?, ?, ?, ?, ?)",
+                                (run_id, row["File"], row["Variable"],
+                                 int(row["First_Line"]), int(row["Last_Line"])),
+                            )
+                        else:
+                            conn.execute(
+                                "INSERT OR REPLACE INTO live_files VALUES (?, ?, ?)",
+                                (run_id, row["File"], int(row["Last_Line"])),
+                            )
+            _purge(conn, now)
+    finally:
+        conn.close()
+    return run_id
+
+
+def get_run(run_id):
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "SELECT run_id, created, project_dir, output_dir, summary FROM runs WHERE run_id = ?",
+            (run_id,),
+        ).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return None
+    return {
+        "run_id": row[0],
+        "created": row[1],
+        "project_dir": row[2],
+        "output_dir": row[3],
+        "summary": json.loads(row[4]) if row[4] else None,
+    }
+
+
+def list_variable_files(run_id, offset=0, limit=100):
+    """Page through the files that have live variable data in a run."""
+    conn = _connect()
+    try:
+        total = conn.execute(
+            "SELECT COUNT(*) FROM live_files WHERE run_id = ?", (run_id,)
+        ).fetchone()[0]
+        rows = conn.execute(
+            "SELECT file, line_count FROM live_files WHERE run_id = ? ORDER BY file LIMIT ? OFFSET ?",
+            (run_id, limit, offset),
+        ).fetchall()
+    finally:
+        conn.close()
+    return {
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "files": [{"file": f, "line_count": n} for f, n in rows],
+    }
+
+
+def get_file_variables(run_id, file, offset=0, limit=500):
+    """Return live variables for lines ``offset + 1`` .. ``offset + limit`` of
+    one file, or None if the run has no data for it."""
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "SELECT line_count FROM live_files WHERE run_id = ? AND file = ?", (run_id, file)
+        ).fetchone()
+        if not row:
+            return None
+        line_count = row[0]
+        first, last = offset + 1, min(offset + limit, line_count)
+        ranges = conn.execute(
+            "SELECT DISTINCT variable, first_line, last_line FROM live_ranges "
+            "WHERE run_id = ? AND file = ? AND first_line <= ? AND last_line >= ?",
+            (run_id, file, last, first),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    starts, ends = defaultdict(list), defaultdict(list)
+    for name, start, end in ranges:
+        starts[max(start, first)].append(name)
+        ends[end].append(name)
+
+    lines = []
+    visible = []
+    for line_num in range(first, last + 1):
+        for name in starts.get(line_num, ()):
+            insort(visible, name)
+        lines.append({"line": line_num, "variables": list(visible)})
+        if line_num in ends:
+            visible = [n for n in visible if n not in ends[line_num]]
+
+    return {
+        "file": file,
+        "line_count": line_count,
+        "offset": offset,
+        "limit": limit,
+        "lines": lines,
+    }
@@ -0,0 +1,117 @@
+import os
+import sys
+import shutil
+import tarfile
+import zipfile
+import tempfile
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_DIR, "../.."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from Metrics.parsers.language_detector import EXTENSION_LANGUAGE_MAP
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+# Limits are enforced on the bytes actually written, not on archive headers
+MAX_ARCHIVE_FILES = _env_int("QUALITAS_MAX_ARCHIVE_FILES", 50000)
+MAX_FILE_BYTES = _env_int("QUALITAS_MAX_FILE_BYTES", 5 * 1024 * 1024)
+MAX_TOTAL_BYTES = _env_int("QUALITAS_MAX_TOTAL_BYTES", 500 * 1024 * 1024)
+_CHUNK = 64 * 1024
+
+ARCHIVE_SUFFIXES = (".zip", ".tar.gz", ".tgz", ".tar")
+
+
+class ArchiveError(ValueError):
+    """The uploaded archive is unsupported, malformed or over a size limit."""
+
+
+def make_upload_dir():
+    return tempfile.mkdtemp(prefix="qualitas_upload_")
+
+
+def remove_upload_dir(path):
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def safe_relpath(name):
+    """Normalise an archive/upload member name; None if it would escape the
+    extraction directory."""
+    name = os.path.normpath(name.replace("\\", "/"))
+    if name.startswith("..") or os.path.isabs(name) or name in (".", ""):
+        return None
+    return name
+
+
+def _is_source(name):
+    return os.path.splitext(name)[1].lower() in EXTENSION_LANGUAGE_MAP
+
+
+class _Extractor:
+    def __init__(self, dest_dir):
+        self.dest_dir = dest_dir
+        self.files = 0
+        self.total_bytes = 0
+
+    def add(self, name, src):
+        relpath = safe_relpath(name)
+        if relpath is None or not _is_source(relpath):
+            return
+        if self.files >= MAX_ARCHIVE_FILES:
+            raise ArchiveError(f"Archive has more than {MAX_ARCHIVE_FILES} source files.")
+
+        dest_path = os.path.join(self.dest_dir, relpath)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        written = 0
+        with open(dest_path, "wb") as out:
+            while True:
+                chunk = src.read(_CHUNK)
+                if not chunk:
+                    break
+                written += len(chunk)
+                self.total_bytes += len(chunk)
+                if written > MAX_FILE_BYTES:
+                    raise ArchiveError(f"{relpath} is larger than {MAX_FILE_BYTES} bytes.")
+                if self.total_bytes > MAX_TOTAL_BYTES:
+                    raise ArchiveError(f"Extracted sources exceed {MAX_TOTAL_BYTES} bytes.")
+                out.write(chunk)
+        self.files += 1
+
+
+def extract_archive(fileobj, filename, dest_dir):
+    """Extract only recognised source files from a .zip or .tar(.gz) upload
+    into dest_dir, streaming member by member. Returns the number of files
+    extracted."""
+    lower = (filename or "").lower()
+    extractor = _Extractor(dest_dir)
+    try:
+        if lower.endswith(".zip"):
+            with zipfile.ZipFile(fileobj) as zf:
+                for info in zf.infolist():
+                    if info.is_dir():
+                        continue
+                    with zf.open(info) as src:
+                        extractor.add(info.filename, src)
+        elif lower.endswith((".tar.gz", ".tgz", ".tar")):
+            # "r|*" reads the stream sequentially without seeking
+            with tarfile.open(fileobj=fileobj, mode="r|*") as tf:
+                for member in tf:
+                    # Regular files only: no links, devices or fifos
+                    if not member.isfile():
+                        continue
+                    src = tf.extractfile(member)
+                    if src is not None:
+                        extractor.add(member.name, src)
+        else:
+            raise ArchiveError(f"Unsupported archive type; expected one of {', '.join(ARCHIVE_SUFFIXES)}.")
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        raise ArchiveError(f"Could not read archive: {e}")
+    return extractor.files
@@ -1,6 +1,10 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from Routes.metrics_routes import router as analyze_router
+from Routes.job_routes import router as job_router
+from Services import prometheus
 import uvicorn
 import os
 from typing import List
@@ -35,6 +39,22 @@ app.add_middleware(
 )
 
 app.include_router(analyze_router, prefix="/api")
+app.include_router(job_router, prefix="/api")
+
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # The route template keeps the label set small (no job or run ids)
+        route = request.scope.get("route")
+        path = getattr(route, "path", None) or "unmatched"
+        prometheus.REQUEST_LATENCY.observe(time.perf_counter() - start, request.method, path, status)
 
 
 @app.get("/")
@@ -42,6 +62,12 @@ def root():
     return {"message": "Welcome to Qualitas Metrics API"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Request latency and job queue depth in the Prometheus text format."""
+    return PlainTextResponse(prometheus.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     _host = os.getenv("HOST", "0.0.0.0")
     try:
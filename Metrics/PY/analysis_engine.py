@@ -0,0 +1,350 @@
+import os
+import mmap
+from functools import partial
+from collections import Counter
+
+import halstead
+import information_flow
+from call_graph import CallGraph
+import live_variables
+import python_ast
+import result_cache
+import source_filter
+from parallel import map_files
+from progress import file_progress, phase
+from timings import timed, timing_phase
+
+
+class AnalysisCancelled(Exception):
+    """Raised when a run is stopped through its cancel event."""
+
+
+# Files at least this big are memory-mapped instead of read into a copy
+MMAP_THRESHOLD = 1024 * 1024
+
+
+def _decode(data):
+    code = str(data, "utf-8", "ignore")
+    # Same newline handling as reading in text mode
+    return code.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def read_source(filepath, prefilter="off"):
+    """Read and decode one file; returns ``(code, digest, kind)``.
+
+    Unless ``prefilter`` is "off" the first block is classified first (see
+    source_filter) and ``kind`` names what was found. With "skip", or for
+    binary files, nothing more is read and ``code`` is None; with "sample"
+    only the first SAMPLE_BYTES are decoded. ``digest`` hashes the bytes
+    that were decoded.
+    """
+    with open(filepath, "rb") as f:
+        block = f.read(source_filter.BLOCK_SIZE)
+        kind = None
+        if prefilter != "off":
+            kind = source_filter.classify_block(block, filepath)
+            if kind and (prefilter == "skip" or kind == source_filter.BINARY):
+                return None, None, kind
+
+        if kind:
+            data = block + f.read(source_filter.SAMPLE_BYTES - len(block))
+        elif len(block) < source_filter.BLOCK_SIZE:
+            data = block
+        elif os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return _decode(data), result_cache.content_hash(data), None
+        else:
+            data = block + f.read()
+    return _decode(data), result_cache.content_hash(data), kind
+
+
+def analyze_code(code, dialect="js", stages=None):
+    """Feed one file's text to every metric collector. Python is parsed once
+    and every metric comes from its syntax tree; files that do not parse
+    fall back to the generic regex collectors. A ``stages`` dict collects
+    the seconds spent per step."""
+    lines = live_variables.split_lines(code)
+    if dialect == "python":
+        result = timed(stages, "parse", python_ast.analyze_python, code, lines)
+        if result is not None:
+            return result
+
+    ops, opnds, loc = timed(stages, "tokenize", halstead.count_tokens, code, dialect)
+    funcs, function_calls = timed(stages, "calls", information_flow.functions_and_calls_from_code, code)
+    var_map = timed(stages, "scopes", live_variables.analyze_lines, lines)
+
+    return {
+        "ops": ops,
+        "opnds": opnds,
+        "loc": loc,
+        "functions": funcs,
+        "function_calls": function_calls,
+        "length": len(code.splitlines()),
+        "variables": var_map,
+    }
+
+
+def analyze_source(filepath, cache_path=None, prefilter="off", timed_stages=False):
+    """Read one file once and analyze it, reusing a cached result when the
+    file content was seen before. ``digest`` and ``cached`` tell the caller
+    whether the result still needs to be stored. Files the prefilter drops
+    give ``{"skipped": kind}``; sampled ones carry ``sampled``. With
+    ``timed_stages`` the result has ``stages``, the seconds per step."""
+    stages = {} if timed_stages else None
+    code, digest, kind = timed(stages, "read", read_source, filepath, prefilter)
+    if code is None:
+        return {"skipped": kind, "digest": None, "cached": False, "stages": stages}
+
+    dialect = halstead.dialect_for(filepath)
+    # The same bytes lex differently as Python and as JS, and a sample is
+    # not the whole file
+    digest = f"{dialect}:{kind}:{digest}" if kind else f"{dialect}:{digest}"
+    result = timed(stages, "cache", result_cache.open_cache(cache_path).get, digest) if cache_path else None
+    cached = result is not None
+    if not cached:
+        result = analyze_code(code, dialect, stages)
+    result["digest"], result["cached"], result["sampled"] = digest, cached, kind
+    result["stages"] = stages
+    return result
+
+
+class ReportSet:
+    """Totals, call graph and open report files of one group of files,
+    usually one language.
+
+    ``analyze_files`` feeds every analyzed file to the set that owns it and
+    ``finish`` builds the information flow from the call graph and closes
+    the reports. See ``run_analysis`` for the arguments.
+    """
+
+    def __init__(self, halstead_csv, infoflow_csv, livevar_csv, live_format="lines",
+                 function_flow_csv=None, call_graph_path=None, prefilter="skip",
+                 report_format="csv", compression=None, combined=None, timings=None, approximate=False):
+        self.halstead_csv = halstead_csv
+        self.infoflow_csv = infoflow_csv
+        self.livevar_csv = livevar_csv
+        self.live_format = live_format
+        self.function_flow_csv = function_flow_csv
+        self.call_graph_path = call_graph_path
+        self.prefilter = prefilter
+        self.report_format = report_format
+        self.compression = compression
+        self.combined = combined
+        self.timings = timings
+        self.approximate = approximate
+
+        self.halstead_sink = None
+        self.live_writer = None
+        self.totals = halstead.project_totals(approximate)
+        self.all_lengths = {}
+        self.graph = CallGraph.load(call_graph_path) if call_graph_path else CallGraph()
+        self.live_summary = {"files": 0, "lines": 0, "max_live": 0}
+        self.filtered = {"skipped": Counter(), "sampled": Counter()}
+
+    def open(self):
+        """Create the live variable report; only sets that have files get one."""
+        os.makedirs(os.path.dirname(self.livevar_csv), exist_ok=True)
+        self.live_writer = live_variables.LiveVariableWriter(self.livevar_csv, self.live_format,
+                                                             self.report_format, self.compression)
+
+    def add(self, filepath, result):
+        """Merge one file's analyze_source result."""
+        timings, combined = self.timings, self.combined
+        if result.get("skipped"):
+            self.filtered["skipped"][result["skipped"]] += 1
+            return
+        if result["sampled"]:
+            self.filtered["sampled"][result["sampled"]] += 1
+
+        metrics = halstead.halstead_from_counters(result["ops"], result["opnds"])
+        if metrics:
+            metrics["File"] = filepath
+            metrics["Lines_of_Code"] = result["loc"]
+            if self.halstead_sink is None:
+                self.halstead_sink = halstead.open_halstead_report(self.halstead_csv, self.report_format,
+                                                                   self.compression, self.approximate)
+            self.halstead_sink.write(metrics)
+            self.totals.add(result["ops"], result["opnds"], result["loc"])
+
+        self.all_lengths[filepath] = result["length"]
+        graph = self.graph
+        if result["digest"] is None or graph.digest(filepath) != result["digest"]:
+            with timing_phase(timings, "graph"):
+                graph.update_file(filepath, result["functions"], result["function_calls"], result["digest"])
+
+        # Rows are streamed, so report writing happens per file as well
+        with timing_phase(timings, "reports"):
+            self.live_writer.write_file(filepath, result["variables"])
+            if combined is not None:
+                combined.add_file(filepath, metrics, result)
+        var_map = result["variables"]
+        live_summary = self.live_summary
+        live_summary["files"] += 1
+        live_summary["lines"] += len(var_map)
+        if var_map:
+            live_summary["max_live"] = max(live_summary["max_live"],
+                                           max(len(v) for v in var_map.values()))
+
+    def close(self):
+        """Close the open reports without finishing them, e.g. on cancel."""
+        for sink in (self.live_writer, self.halstead_sink):
+            if sink is not None:
+                sink.close()
+
+    def finish(self, progress=None):
+        """Write the remaining reports; returns what run_analysis returns."""
+        timings, graph = self.timings, self.graph
+        report_format, compression = self.report_format, self.compression
+        for action in ("skipped", "sampled"):
+            if self.filtered[action]:
+                counts = ", ".join(f"{n} {kind}" for kind, n in sorted(self.filtered[action].items()))
+                print(f"Prefilter {action} {counts} file(s)")
+
+        with phase(progress, "graph"), timing_phase(timings, "graph"):
+            # Files gone since the saved graph was written
+            for filepath in graph.paths():
+                if filepath not in self.all_lengths:
+                    graph.remove_file(filepath)
+
+            flow = information_flow.file_flow_rows(graph, self.all_lengths)
+            function_flow = information_flow.function_flow_rows(graph) if self.function_flow_csv else None
+
+        reports = {"halstead": None, "information_flow": None, "function_flow": None, "live_variables": None}
+        with phase(progress, "reports"), timing_phase(timings, "reports"):
+            total_metrics = self.totals.metrics()
+            if total_metrics:
+                self.halstead_sink.write(total_metrics)
+
+            if self.halstead_sink is not None:
+                self.halstead_sink.close()
+                reports["halstead"] = self.halstead_sink.path
+                print(f"\n Halstead metrics saved to: {self.halstead_sink.path}")
+
+            if self.combined is not None:
+                self.combined.add_flow(flow, graph)
+            reports["information_flow"] = information_flow.write_information_flow_csv(
+                flow, self.infoflow_csv, report_format, compression)
+            print(f"\n Information Flow Metrics saved to: {reports['information_flow']}")
+
+            if function_flow is not None:
+                reports["function_flow"] = information_flow.write_function_flow_csv(
+                    function_flow, self.function_flow_csv, report_format, compression)
+                print(f"\n Function Flow Metrics saved to: {reports['function_flow']}")
+            if self.call_graph_path:
+                graph.save(self.call_graph_path)
+
+            if self.live_writer is not None:
+                self.live_writer.close()
+                reports["live_variables"] = self.live_writer.path
+                print(f"\nLive Variable report saved to: {self.live_writer.path}")
+
+        return {
+            **self.totals.summary(),
+            "live_variables_summary": self.live_summary,
+            "prefilter_summary": {"policy": self.prefilter, "skipped": dict(self.filtered["skipped"]),
+                                  "sampled": dict(self.filtered["sampled"])},
+            "reports": reports,
+        }
+
+
+def analyze_files(groups, index=None, jobs=1, cache_path=None, prefilter="skip",
+                  cancel_event=None, progress=None, timings=None, analyzed=None):
+    """Analyze the files of several ReportSets in one scheduling pass.
+
+    ``groups`` is a list of ``(report_set, paths)``; every path is read and
+    analyzed once and its result goes to the set that listed it first.
+    Files of all sets share one worker pool and are handed out largest
+    first, but reach the sets in input order. ``analyzed`` maps paths that
+    were already analyzed (such as a sampling pilot) to their analyze_source
+    results, which are used as they are. The sets are not finished here.
+    """
+    owner = {}
+    for report_set, set_paths in groups:
+        if set_paths:
+            report_set.open()
+        for path in set_paths:
+            owner.setdefault(path, report_set)
+    paths = list(owner)
+
+    cache = result_cache.open_cache(cache_path) if cache_path else None
+    cache_hits = 0
+    tracker = file_progress(progress, "analysis", len(paths))
+    analyze = partial(analyze_source, cache_path=cache_path, prefilter=prefilter,
+                      timed_stages=timings is not None)
+    analyzed = analyzed or {}
+    todo = [path for path in paths if path not in analyzed]
+    sizes = source_filter.file_sizes(todo, index) if jobs != 1 else None
+    # map_files keeps input order, so its results interleave with the
+    # analyzed ones in the order of paths
+    results = map_files(analyze, todo, jobs, weights=sizes)
+    for filepath in paths:
+        result = analyzed.get(filepath)
+        if result is None:
+            _, result = next(results)
+        if cancel_event is not None and cancel_event.is_set():
+            for report_set, _ in groups:
+                report_set.close()
+            raise AnalysisCancelled("Analysis was cancelled")
+        tracker.advance(filepath, result["cached"])
+        if timings is not None and result["stages"] is not None:
+            timings.add_file(filepath, result["stages"])
+        if not result.get("skipped"):
+            if result["cached"]:
+                cache_hits += 1
+            elif cache is not None:
+                cache.put(result["digest"], result)
+        owner[filepath].add(filepath, result)
+    tracker.finish()
+
+    if cache is not None:
+        cache.flush()
+        print(f"Reused cached results for {cache_hits} of {len(paths)} files")
+
+
+def run_analysis(project_dir, ignore_dirs, halstead_csv, infoflow_csv, livevar_csv,
+                 file_extensions=('.js', '.jsx'), index=None, jobs=1,
+                 cache_path=None, live_format="lines", cancel_event=None, progress=None,
+                 function_flow_csv=None, call_graph_path=None, prefilter="skip",
+                 report_format="csv", compression=None, combined=None, timings=None):
+    """Run Halstead, information flow and live variable analysis in a single
+    pass over the project and write all three CSV reports.
+
+    Pass a prebuilt ProjectIndex as ``index`` to reuse its file list instead
+    of walking the tree. With ``jobs`` > 1 files are analyzed in a process
+    pool; results are merged here in index order, so the reports are the same
+    for any worker count. ``cache_path`` points at a ResultCache database;
+    unchanged files are then loaded from it instead of being re-analyzed and
+    the project totals are rebuilt from the cached per-file results.
+    ``live_format`` selects the live variable report layout ("lines" or
+    "ranges"); rows are streamed to disk as each file completes. Setting
+    ``cancel_event`` (a threading.Event) stops the run with AnalysisCancelled.
+    ``progress`` is an optional ProgressBus that receives per-file progress
+    and report-writing phase events. Fan-in/fan-out come from a
+    function-level CallGraph; ``function_flow_csv`` also writes them per
+    function, and ``call_graph_path`` loads the graph saved by the previous
+    run, updates only the files whose content changed and saves it again.
+    ``prefilter`` decides what happens to binary, minified and generated
+    files: "skip" leaves them out, "sample" analyzes their first
+    SAMPLE_BYTES (binary files are always skipped), "off" analyzes them in
+    full. Files are handed to workers largest first. ``report_format``
+    ("csv", "jsonl" or "parquet") and ``compression`` select the report
+    files (see report_sinks); the ``*_csv`` arguments then only give the
+    base name. Halstead and live variable rows are written as each file
+    completes. A CombinedReports passed as ``combined`` receives the same
+    rows for the cross-language reports. A Timings passed as ``timings``
+    gets per-file stage times and the graph and report phases.
+
+    Returns the project operator/operand counts, a live variable summary,
+    the prefilter counts and the paths of the reports written; the per-line
+    data itself only goes to the live variable report. To analyze several
+    languages in one pass use ReportSet and ``analyze_files`` directly.
+    """
+    paths = live_variables.get_files_by_extensions(project_dir, ignore_dirs, file_extensions, index)
+    report_set = ReportSet(halstead_csv, infoflow_csv, livevar_csv, live_format, function_flow_csv,
+                           call_graph_path, prefilter, report_format, compression, combined, timings)
+    try:
+        analyze_files([(report_set, paths)], index, jobs, cache_path, prefilter,
+                      cancel_event, progress, timings)
+    except AnalysisCancelled:
+        raise AnalysisCancelled(f"Analysis of {project_dir} was cancelled") from None
+    return report_set.finish(progress)
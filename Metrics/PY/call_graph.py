@@ -0,0 +1,299 @@
+import os
+import json
+from array import array
+
+# Caller name for calls made outside any function body
+MODULE_FUNCTION = "<module>"
+FORMAT_VERSION = 1
+
+
+class _FileEntry:
+    """Call data of one file. ``functions`` holds function ids, with the
+    file's module-level pseudo function first; each call site is the index
+    of its caller in ``functions`` plus the interned callee name."""
+
+    __slots__ = ("file_id", "digest", "functions", "callers", "callees")
+
+    def __init__(self, file_id, digest):
+        self.file_id = file_id
+        self.digest = digest
+        self.functions = array("I")
+        self.callers = array("I")
+        self.callees = array("I")
+
+
+class CallGraph:
+    """Function-level call graph over a whole project.
+
+    Every definition gets an interned integer id, so a name defined in
+    several files is several functions. Call sites are stored by callee
+    name and resolved when the graph is built: a call goes to the
+    definition in the caller's own file if there is one, otherwise to the
+    only definition of that name in the project. Calls to names defined in
+    several other files are ambiguous and only count towards fan-out.
+    Resolved edges live in compact CSR adjacency arrays, in both
+    directions.
+
+    Files are added, replaced and removed one at a time with
+    ``update_file``/``remove_file``; the adjacency arrays are rebuilt lazily
+    on the next query. ``save``/``load`` keep the graph between runs.
+    """
+
+    def __init__(self):
+        self._names = []
+        self._name_ids = {}
+        self._paths = []
+        self._files = {}
+        self._free_files = []
+        # Per function id: interned name and file id, -1 for free slots
+        self._func_name = array("i")
+        self._func_file = array("i")
+        self._free_funcs = []
+        # Name id to the ids of the functions defining it
+        self._defs = {}
+        self._built = False
+        self._module_id = self._name_id(MODULE_FUNCTION)
+
+    # Interning
+
+    def _name_id(self, name):
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+        return name_id
+
+    def _new_function(self, name_id, file_id):
+        if self._free_funcs:
+            fid = self._free_funcs.pop()
+            self._func_name[fid] = name_id
+            self._func_file[fid] = file_id
+        else:
+            fid = len(self._func_name)
+            self._func_name.append(name_id)
+            self._func_file.append(file_id)
+        # Every file has a module pseudo function; calls never resolve to it
+        if name_id != self._module_id:
+            self._defs.setdefault(name_id, set()).add(fid)
+        return fid
+
+    # Updates
+
+    def update_file(self, path, functions, function_calls, digest=None):
+        """Replace everything known about ``path``. ``functions`` are the
+        names it defines; ``function_calls`` maps each caller name (or
+        MODULE_FUNCTION) to the names it calls."""
+        self.remove_file(path)
+        if self._free_files:
+            file_id = self._free_files.pop()
+            self._paths[file_id] = path
+        else:
+            file_id = len(self._paths)
+            self._paths.append(path)
+        entry = self._files[path] = _FileEntry(file_id, digest)
+
+        local = {}
+        for name in [MODULE_FUNCTION] + sorted(set(functions) - {MODULE_FUNCTION}):
+            local[name] = len(entry.functions)
+            entry.functions.append(self._new_function(self._name_id(name), file_id))
+
+        for caller, callees in function_calls.items():
+            caller_index = local.get(caller, 0)
+            for callee in sorted(set(callees)):
+                entry.callers.append(caller_index)
+                entry.callees.append(self._name_id(callee))
+        self._built = False
+
+    def remove_file(self, path):
+        entry = self._files.pop(path, None)
+        if entry is None:
+            return
+        for fid in entry.functions:
+            defs = self._defs.get(self._func_name[fid])
+            if defs is not None:
+                defs.discard(fid)
+                if not defs:
+                    del self._defs[self._func_name[fid]]
+            self._func_name[fid] = -1
+            self._func_file[fid] = -1
+            self._free_funcs.append(fid)
+        self._paths[entry.file_id] = None
+        self._free_files.append(entry.file_id)
+        self._built = False
+
+    def digest(self, path):
+        entry = self._files.get(path)
+        return entry.digest if entry else None
+
+    def paths(self):
+        return list(self._files)
+
+    def __len__(self):
+        return len(self._func_name) - len(self._free_funcs)
+
+    # Adjacency
+
+    def _resolve(self, local, name_id):
+        """Function id a call to ``name_id`` reaches from the file whose
+        definitions are ``local`` (name id to function id), or None."""
+        fid = local.get(name_id)
+        if fid is not None:
+            return fid
+        defs = self._defs.get(name_id)
+        if defs is not None and len(defs) == 1:
+            return next(iter(defs))
+        return None
+
+    def _build(self):
+        if self._built:
+            return
+        count = len(self._func_name)
+        src, dst = array("I"), array("I")
+        fan_out = array("I", bytes(4 * count))
+        file_fan_in = array("I", bytes(4 * len(self._paths)))
+        file_fan_out = array("I", bytes(4 * len(self._paths)))
+        file_self_fan_in = array("I", bytes(4 * len(self._paths)))
+
+        for entry in self._files.values():
+            local = {self._func_name[fid]: fid for fid in entry.functions}
+            per_caller = {}
+            for caller_index, name_id in zip(entry.callers, entry.callees):
+                per_caller.setdefault(entry.functions[caller_index], set()).add(name_id)
+
+            file_names = set()
+            for caller, name_ids in per_caller.items():
+                fan_out[caller] = len(name_ids)
+                file_names |= name_ids
+                targets = {self._resolve(local, name_id) for name_id in name_ids}
+                targets.discard(None)
+                for target in targets:
+                    src.append(caller)
+                    dst.append(target)
+            # File level: distinct names called, and one fan-in per distinct
+            # (calling file, name) pair for the file defining the name
+            file_fan_out[entry.file_id] = len(file_names)
+            for name_id in file_names:
+                target = self._resolve(local, name_id)
+                if target is not None:
+                    file_fan_in[self._func_file[target]] += 1
+                    if self._func_file[target] == entry.file_id:
+                        file_self_fan_in[entry.file_id] += 1
+
+        self._out_offsets, self._out_targets = _csr(src, dst, count)
+        self._in_offsets, self._in_sources = _csr(dst, src, count)
+        self._fan_out = fan_out
+        self._file_fan_in = file_fan_in
+        self._file_fan_out = file_fan_out
+        self._file_self_fan_in = file_self_fan_in
+        self._built = True
+
+    # Queries
+
+    def _function_id(self, path, name):
+        entry = self._files.get(path)
+        name_id = self._name_ids.get(name)
+        if entry is None or name_id is None:
+            return None
+        for fid in entry.functions:
+            if self._func_name[fid] == name_id:
+                return fid
+        return None
+
+    def _describe(self, fid):
+        return self._paths[self._func_file[fid]], self._names[self._func_name[fid]]
+
+    def callees(self, path, name):
+        """``(path, name)`` of the functions ``name`` in ``path`` calls."""
+        self._build()
+        fid = self._function_id(path, name)
+        if fid is None:
+            return []
+        start, end = self._out_offsets[fid], self._out_offsets[fid + 1]
+        return [self._describe(t) for t in self._out_targets[start:end]]
+
+    def callers(self, path, name):
+        """``(path, name)`` of the functions calling ``name`` in ``path``."""
+        self._build()
+        fid = self._function_id(path, name)
+        if fid is None:
+            return []
+        start, end = self._in_offsets[fid], self._in_offsets[fid + 1]
+        return [self._describe(s) for s in self._in_sources[start:end]]
+
+    def function_fan(self):
+        """Yield ``(path, name, fan_in, fan_out)`` for every function. Fan-in
+        counts distinct calling functions; fan-out counts distinct names
+        called, including ones defined outside the project."""
+        self._build()
+        for path, entry in self._files.items():
+            for fid in entry.functions:
+                fan_in = self._in_offsets[fid + 1] - self._in_offsets[fid]
+                yield path, self._names[self._func_name[fid]], fan_in, self._fan_out[fid]
+
+    def file_fan(self, path):
+        """``(fan_in, fan_out)`` of a file, with the same meaning as the
+        file-level information flow report."""
+        self._build()
+        file_id = self._files[path].file_id
+        return self._file_fan_in[file_id], self._file_fan_out[file_id]
+
+    def file_self_fan_in(self, path):
+        """The part of a file's fan-in that comes from its own calls."""
+        self._build()
+        return self._file_self_fan_in[self._files[path].file_id]
+
+    # Persistence
+
+    def save(self, path):
+        """Write the graph as JSON. Only definitions and call sites are
+        stored; ids and adjacency arrays are rebuilt on load."""
+        files = {}
+        for file_path, entry in self._files.items():
+            files[file_path] = {
+                "digest": entry.digest,
+                "functions": [self._func_name[fid] for fid in entry.functions],
+                "callers": entry.callers.tolist(),
+                "callees": entry.callees.tolist(),
+            }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": FORMAT_VERSION, "names": self._names, "files": files}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a graph written by ``save``. A missing, unreadable or
+        outdated file gives an empty graph."""
+        graph = cls()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return graph
+        if data.get("version") != FORMAT_VERSION:
+            return graph
+
+        names = data["names"]
+        for file_path, stored in data["files"].items():
+            functions = [names[n] for n in stored["functions"]]
+            function_calls = {}
+            for caller_index, callee in zip(stored["callers"], stored["callees"]):
+                function_calls.setdefault(functions[caller_index], []).append(names[callee])
+            graph.update_file(file_path, functions, function_calls, stored["digest"])
+        return graph
+
+
+def _csr(keys, values, count):
+    """Group ``values`` by ``keys`` (ids below ``count``) into offset and
+    value arrays with a counting sort."""
+    offsets = array("I", bytes(4 * (count + 1)))
+    for key in keys:
+        offsets[key + 1] += 1
+    for i in range(count):
+        offsets[i + 1] += offsets[i]
+    position = array("I", offsets[:count])
+    grouped = array("I", bytes(4 * len(values)))
+    for key, value in zip(keys, values):
+        grouped[position[key]] = value
+        position[key] += 1
+    return offsets, grouped
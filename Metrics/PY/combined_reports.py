@@ -0,0 +1,80 @@
+import os
+import halstead
+import information_flow
+import live_variables
+
+COMBINED_NAMES = {
+    "halstead": "combined_halstead.csv",
+    "information_flow": "combined_information_flow.csv",
+    "live_variables": "combined_live_variables.csv",
+}
+
+
+class CombinedReports:
+    """Cross-language reports, filled while each language is analyzed.
+
+    run_analysis hands every file result to ``add_file`` and its flow rows
+    to ``add_flow`` as well as writing its own reports, so nothing is read
+    back from disk. Halstead and live variable rows are streamed; flow rows
+    (one per file) are kept and sorted once by complexity. ``finish`` adds a
+    PROJECT_TOTAL Halstead row computed from the summed operator and operand
+    counts of every language (estimated when ``approximate``) and returns
+    the paths written.
+    """
+
+    def __init__(self, output_dir, live_format="lines", report_format="csv", compression=None,
+                 approximate=False):
+        self.output_dir = output_dir
+        self.live_format = live_format
+        self.report_format = report_format
+        self.compression = compression
+        self.approximate = approximate
+        self.totals = halstead.project_totals(approximate)
+        self._halstead = None
+        self._live = None
+        self._flow = []
+
+    def _path(self, report):
+        return os.path.join(self.output_dir, COMBINED_NAMES[report])
+
+    def add_file(self, filepath, metrics, result):
+        """One analyzed file: its Halstead row (or None) and engine result."""
+        if metrics:
+            if self._halstead is None:
+                self._halstead = halstead.open_halstead_report(self._path("halstead"),
+                                                               self.report_format, self.compression,
+                                                               self.approximate)
+            self._halstead.write(metrics)
+            self.totals.add(result["ops"], result["opnds"], result["loc"])
+
+        if self._live is None:
+            self._live = live_variables.LiveVariableWriter(self._path("live_variables"), self.live_format,
+                                                           self.report_format, self.compression)
+        self._live.write_file(filepath, result["variables"])
+
+    def add_flow(self, rows, graph=None):
+        """Flow rows of one language; ``graph`` is its call graph."""
+        self._flow.extend(rows)
+
+    def close(self):
+        """Close the open reports without a total, e.g. after a cancel."""
+        for sink in (self._halstead, self._live):
+            if sink is not None:
+                sink.close()
+
+    def finish(self):
+        """Write the project total and the flow report; returns the path of
+        each combined report, None for the ones with no rows."""
+        paths = dict.fromkeys(COMBINED_NAMES)
+        total_metrics = self.totals.metrics()
+        if total_metrics:
+            self._halstead.write(total_metrics)
+        self.close()
+
+        if self._halstead is not None:
+            paths["halstead"] = self._halstead.path
+        if self._live is not None:
+            paths["live_variables"] = self._live.path
+            paths["information_flow"] = information_flow.write_information_flow_csv(
+                self._flow, self._path("information_flow"), self.report_format, self.compression)
+        return paths
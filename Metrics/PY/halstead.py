@@ -1,9 +1,14 @@
 import os
 import re
 import math
-import csv
 from collections import Counter
 
+from live_variables import get_files_by_extensions
+from parallel import map_files
+from progress import file_progress
+from report_sinks import open_sink
+from sketches import HyperLogLog, DEFAULT_PRECISION
+
 OPERATORS = {
     "+", "-", "*", "/", "%", "++", "--", "==", "===",
     "!=", "!==", ">", "<", ">=", "<=", "&&", "||", "!",
@@ -14,26 +19,103 @@ OPERATORS = {
     "async", "import", "export", "from", "class", "extends"
 }
 
-TOKEN_PATTERN = re.compile(r"===|!==|==|!=|<=|>=|&&|\|\||=>|[A-Za-z_]\w*|[+\-*/%=&|^<>!?;:.,{}()[\]]")
-COMMENT_PATTERN = re.compile(r"(//[^\n]*|/\*[\s\S]*?\*/)", re.MULTILINE)
+TOKEN = r"===|!==|==|!=|<=|>=|&&|\|\||=>|[A-Za-z_]\w*|[+\-*/%=&|^<>!?;:.,{}()[\]]"
+TOKEN_PATTERN = re.compile(TOKEN)
+
+
+def _lexer(comments, strings, comment_start, block):
+    """One alternation that matches, in a single left-to-right scan, a marker
+    for every line that holds code, comments, whole string literals and
+    tokens. Comments and strings are consumed before TOKEN can see inside
+    them, so ``"http://x"`` stays one literal and ``/* a */`` yields nothing.
+
+    The scan runs over the code with a "\\n" in front, so every line
+    starts with a line break. A line that starts with code gets that "\\n"
+    as its marker. One that starts with ``block`` comments followed by
+    code gets an empty marker in front of the line break, so the comment
+    is still matched (and dropped) right after it. That alternative comes
+    first, the others in rough order of how often they are tried."""
+    return re.compile(
+        r"(?=\n[ \t]*(?:(?:" + block + r")[ \t]*)+(?!" + comment_start + r")\S)"
+        + "|" + comments
+        + "|" + strings
+        + "|" + TOKEN
+        + r"|\n(?=[ \t]*(?!" + comment_start + r")\S)"
+    )
+
+
+_C_STRINGS = r"\"(?:[^\"\\\n]|\\[\s\S])*\"|'(?:[^'\\\n]|\\[\s\S])*'"
+_TRIPLE_QUOTED = r"(?:\"{3}[\s\S]*?\"{3}|'{3}[\s\S]*?'{3})"
+# Block comments and docstrings written so they cannot run past their
+# first closing delimiter, for the line marker lookahead
+_C_BLOCK = r"/\*[^*]*(?:\*(?!/)[^*]*)*\*/"
+_PY_BLOCK = r"[rRuU]?(?:\"{3}[^\"]*(?:\"(?!\"\")[^\"]*)*\"{3}|'{3}[^']*(?:'(?!'')[^']*)*'{3})"
+
+# Per dialect: comments, string literals, what starts a comment line and
+# the comments code can follow on the same line
+SYNTAX = {
+    "c": (r"//[^\n]*|/\*[\s\S]*?\*/", _C_STRINGS, r"/[/*]", _C_BLOCK),
+    "js": (r"//[^\n]*|/\*[\s\S]*?\*/", _C_STRINGS + r"|`(?:[^`\\]|\\[\s\S])*`", r"/[/*]", _C_BLOCK),
+    # A triple-quoted string opening a line is a docstring (or a string used
+    # as a comment) and is consumed together with its line break
+    "python": (
+        r"#[^\n]*|\n[ \t]*[rRuU]?" + _TRIPLE_QUOTED,
+        r"[rRbBuUfF]{0,2}(?:" + _TRIPLE_QUOTED + "|" + _C_STRINGS + ")",
+        r"#|[rRuU]?(?:\"{3}|'{3})",
+        _PY_BLOCK,
+    ),
+}
+LEXERS = {dialect: _lexer(*syntax) for dialect, syntax in SYNTAX.items()}
+_COMMENT_PREFIXES = {"c": ("//", "/*"), "js": ("//", "/*"), "python": ("#", "\n")}
+
+DIALECTS = {".js": "js", ".jsx": "js", ".ts": "js", ".tsx": "js", ".py": "python"}
+
 
+def dialect_for(filepath):
+    """Lexer dialect for a file; C-like syntax unless the extension says
+    otherwise."""
+    return DIALECTS.get(os.path.splitext(filepath)[1].lower(), "c")
 
-def extract_operators_operands(filepath):
+
+HALSTEAD_FIELDS = ["File", "n1", "n2", "N1", "N2", "Vocabulary", "Length", "Calc_Length",
+                   "Volume", "Difficulty", "Effort", "Time_sec", "Bugs", "Lines_of_Code"]
+HALSTEAD_COLUMNS = [("File", str), ("n1", int), ("n2", int), ("N1", int), ("N2", int),
+                    ("Vocabulary", int), ("Length", int), ("Calc_Length", float), ("Volume", float),
+                    ("Difficulty", float), ("Effort", float), ("Time_sec", float), ("Bugs", float),
+                    ("Lines_of_Code", int)]
+# Approximate reports add the error bound of the estimated n1/n2 of their
+# PROJECT_TOTAL row; per-file rows are always exact
+APPROXIMATE_COLUMNS = HALSTEAD_COLUMNS + [("n1_error", int), ("n2_error", int)]
+# Error bounds are this many standard errors, about a 95% interval
+ERROR_BOUND_SIGMAS = 2
+
+
+def count_operators_operands(filepath):
     with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
         code = f.read()
+    return count_tokens(code, dialect_for(filepath))
 
-    code_no_comments = re.sub(COMMENT_PATTERN, "", code)
-    tokens = TOKEN_PATTERN.findall(code_no_comments)
 
-    operators, operands = [], []
-    for token in tokens:
+def count_tokens(code, dialect="js"):
+    """Count operators, operands and lines of code in one pass of the
+    dialect's lexer. String literals count as a single operand each;
+    comments and docstrings are dropped. LOC is the number of lines that
+    hold code once comments are removed; a string spanning lines counts
+    once, on the line where it starts."""
+    counts = Counter(LEXERS[dialect].findall("\n" + code))
+    # Line markers are "\n", or "" before comments that code follows
+    loc = counts.pop("\n", 0) + counts.pop("", 0)
+
+    comment_prefixes = _COMMENT_PREFIXES[dialect]
+    operators, operands = Counter(), Counter()
+    for token, count in counts.items():
         if token in OPERATORS:
-            operators.append(token)
+            operators[token] = count
+        elif token.startswith(comment_prefixes):
+            continue
         else:
-            operands.append(token)
+            operands[token] = count
 
-    lines = [line.strip() for line in code_no_comments.split("\n") if line.strip()]
-    loc = len(lines)
     return operators, operands, loc
 
 
@@ -58,55 +140,134 @@ def calculate_halstead(n1, n2, N1, N2):
     }
 
 
-def run_halstead_analysis(project_dir, ignore_dirs, output_csv, file_extensions=('.js', '.jsx')):
-    total_ops, total_opnds = [], []
-    total_loc = 0
-    file_results = []
-
-    for root, dirs, files in os.walk(project_dir):
-        dirs[:] = [d for d in dirs if d not in ignore_dirs]
-
-        for file in files:
-            if file.endswith(file_extensions):
-                filepath = os.path.join(root, file)
-                print(f"Analyzing: {filepath}")
-                ops, opnds, loc = extract_operators_operands(filepath)
-
-                op_counter = Counter(ops)
-                opd_counter = Counter(opnds)
-                n1, n2 = len(op_counter), len(opd_counter)
-                N1, N2 = sum(op_counter.values()), sum(opd_counter.values())
-
-                metrics = calculate_halstead(n1, n2, N1, N2)
-                if metrics:
-                    metrics["File"] = filepath
-                    metrics["Lines_of_Code"] = loc
-                    file_results.append(metrics)
-                    total_ops.extend(ops)
-                    total_opnds.extend(opnds)
-                    total_loc += loc
-
-    total_op_counter = Counter(total_ops)
-    total_opd_counter = Counter(total_opnds)
-    n1, n2 = len(total_op_counter), len(total_opd_counter)
-    N1, N2 = sum(total_op_counter.values()), sum(total_opd_counter.values())
-
-    total_metrics = calculate_halstead(n1, n2, N1, N2)
-    if total_metrics:
-        total_metrics["File"] = "PROJECT_TOTAL"
-        total_metrics["Lines_of_Code"] = total_loc
-        file_results.append(total_metrics)
+def halstead_from_counters(op_counter, opd_counter):
+    n1, n2 = len(op_counter), len(opd_counter)
+    N1, N2 = sum(op_counter.values()), sum(opd_counter.values())
+    return calculate_halstead(n1, n2, N1, N2)
+
+
+class ProjectTotals:
+    """Exact operator and operand Counters behind a PROJECT_TOTAL row."""
+
+    approximate = False
+
+    def __init__(self):
+        self.ops, self.opnds = Counter(), Counter()
+        self.loc = 0
+
+    def add(self, ops, opnds, loc):
+        self.ops.update(ops)
+        self.opnds.update(opnds)
+        self.loc += loc
 
+    def metrics(self):
+        """The PROJECT_TOTAL row, or None when there is nothing to total."""
+        total_metrics = halstead_from_counters(self.ops, self.opnds)
+        if total_metrics:
+            total_metrics["File"] = "PROJECT_TOTAL"
+            total_metrics["Lines_of_Code"] = self.loc
+        return total_metrics
 
-    if file_results:
-        keys = ["File", "n1", "n2", "N1", "N2", "Vocabulary", "Length", "Calc_Length",
-                "Volume", "Difficulty", "Effort", "Time_sec", "Bugs", "Lines_of_Code"]
+    def summary(self):
+        return {"total_ops": dict(self.ops), "total_opnds": dict(self.opnds)}
 
-        with open(output_csv, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=keys)
-            writer.writeheader()
-            writer.writerows(file_results)
 
-        print(f"\n Halstead metrics saved to: {output_csv}")
+class ApproximateTotals:
+    """Bounded-memory PROJECT_TOTAL: n1/n2 are HyperLogLog estimates, N1/N2
+    and LOC stay exact. Memory does not grow with the number of distinct
+    operands."""
+
+    approximate = True
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        self.ops, self.opnds = HyperLogLog(precision), HyperLogLog(precision)
+        self.N1 = self.N2 = 0
+        self.loc = 0
+
+    def add(self, ops, opnds, loc):
+        self.ops.update(ops)
+        self.opnds.update(opnds)
+        self.N1 += sum(ops.values())
+        self.N2 += sum(opnds.values())
+        self.loc += loc
+
+    def estimate(self):
+        """Estimated n1/n2 with their error bounds and the exact N1/N2."""
+        n1, n2 = round(self.ops.cardinality()), round(self.opnds.cardinality())
+        bound = ERROR_BOUND_SIGMAS * self.ops.relative_error
+        return {
+            "n1": n1, "n1_error": math.ceil(n1 * bound),
+            "n2": n2, "n2_error": math.ceil(n2 * bound),
+            "N1": self.N1, "N2": self.N2,
+            "relative_error": round(bound, 4),
+        }
+
+    def metrics(self):
+        estimate = self.estimate()
+        total_metrics = calculate_halstead(estimate["n1"], estimate["n2"], self.N1, self.N2)
+        if total_metrics:
+            total_metrics["File"] = "PROJECT_TOTAL"
+            total_metrics["Lines_of_Code"] = self.loc
+            total_metrics["n1_error"] = estimate["n1_error"]
+            total_metrics["n2_error"] = estimate["n2_error"]
+        return total_metrics
+
+    def summary(self):
+        # Operator/operand maps are exactly what this mode avoids keeping
+        return {"total_ops": {}, "total_opnds": {}, "halstead_estimate": self.estimate()}
+
+
+def project_totals(approximate=False):
+    return ApproximateTotals() if approximate else ProjectTotals()
+
+
+def open_halstead_report(output_csv, report_format="csv", compression=None, approximate=False):
+    columns = APPROXIMATE_COLUMNS if approximate else HALSTEAD_COLUMNS
+    return open_sink(output_csv, columns, report_format, compression)
+
+
+def write_halstead_csv(file_results, output_csv, report_format="csv", compression=None):
+    """Write Halstead rows; returns the report path, whose extension follows
+    ``report_format``."""
+    with open_halstead_report(output_csv, report_format, compression) as sink:
+        sink.write_many(file_results)
+    return sink.path
+
+
+def run_halstead_analysis(project_dir, ignore_dirs, output_csv, file_extensions=('.js', '.jsx'), index=None, jobs=1,
+                          progress=None, report_format="csv", compression=None, approximate=False):
+    """Write per-file Halstead rows and a PROJECT_TOTAL row to ``output_csv``.
+
+    With ``approximate`` the total's n1/n2 are estimated with fixed-size
+    sketches instead of Counters of every distinct token, and the report
+    gets n1_error/n2_error columns.
+    """
+    totals = project_totals(approximate)
+    sink = None
+
+    paths = get_files_by_extensions(project_dir, ignore_dirs, file_extensions, index)
+    tracker = file_progress(progress, "halstead", len(paths))
+    # Rows go to disk as each file completes; the report is only created
+    # once there is a row to write
+    for filepath, (ops, opnds, loc) in map_files(count_operators_operands, paths, jobs):
+        tracker.advance(filepath)
+
+        metrics = halstead_from_counters(ops, opnds)
+        if metrics:
+            metrics["File"] = filepath
+            metrics["Lines_of_Code"] = loc
+            if sink is None:
+                sink = open_halstead_report(output_csv, report_format, compression, approximate)
+            sink.write(metrics)
+            totals.add(ops, opnds, loc)
+    tracker.finish()
+
+    total_metrics = totals.metrics()
+    if total_metrics:
+        sink.write(total_metrics)
+
+    if sink is not None:
+        sink.close()
+        print(f"\n Halstead metrics saved to: {sink.path}")
     else:
-        print("\n No JS/JSX files found for analysis.")
\ No newline at end of file
+        print(f"\n No files found for extensions: {file_extensions}")
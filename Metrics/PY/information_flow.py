@@ -1,72 +1,156 @@
-import os
 import re
-import csv
+from bisect import bisect_left
 from collections import defaultdict
 
+from call_graph import CallGraph, MODULE_FUNCTION
+from live_variables import get_files_by_extensions
+from parallel import map_files
+from progress import file_progress
+from report_sinks import open_sink
+
 FUNC_DEF_PATTERN = re.compile(r'function\s+([A-Za-z0-9_]+)|([A-Za-z0-9_]+)\s*=\s*\(.*?\)\s*=>')
 FUNC_CALL_PATTERN = re.compile(r'([A-Za-z0-9_]+)\s*\(')
+BRACE_PATTERN = re.compile(r'[{}]')
+CALL_KEYWORDS = {'if', 'for', 'while', 'switch', 'return'}
+
+FLOW_COLUMNS = [("File", str), ("Length", int), ("FanIn", int), ("FanOut", int), ("Complexity", int)]
+FUNCTION_FLOW_COLUMNS = [("File", str), ("Function", str), ("FanIn", int), ("FanOut", int),
+                         ("Complexity", int)]
 
 
 def extract_functions_and_calls(filepath):
     with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
         code = f.read()
-    
-    functions = set()
-    for match in FUNC_DEF_PATTERN.findall(code):
-        func_name = match[0] if match[0] else match[1]
-        if func_name:
-            functions.add(func_name)
-    
-    calls = [m for m in FUNC_CALL_PATTERN.findall(code)
-             if m not in ['if', 'for', 'while', 'switch', 'return']]
-    
-    return functions, calls, len(code.splitlines())
-
-
-def run_information_flow_analysis(project_dir, ignore_dirs , output_csv, file_extensions=('.js', '.jsx')):
+    functions, function_calls = functions_and_calls_from_code(code)
+    return functions, function_calls, len(code.splitlines())
+
+
+def _function_spans(code, defs):
+    """``(start, end, name)`` of the function body of every FUNC_DEF_PATTERN
+    match in ``defs``.
+    A body runs from the first ``{`` after the definition to its matching
+    ``}``; an arrow function without braces ends with its line."""
+    opens, close_of, stack = [], {}, []
+    for m in BRACE_PATTERN.finditer(code):
+        if m.group() == "{":
+            stack.append(m.start())
+            opens.append(m.start())
+        elif stack:
+            close_of[stack.pop()] = m.end()
+
+    spans = []
+    for m in defs:
+        name = m.group(1) or m.group(2)
+        i = bisect_left(opens, m.end())
+        brace = opens[i] if i < len(opens) else None
+        if brace is not None and brace in close_of:
+            gap = code[m.end():brace]
+            # ``function f(a, b) {`` or ``f = (a) => {``
+            if (m.group(1) and ";" not in gap) or not gap.strip():
+                spans.append((m.start(), close_of[brace], name))
+                continue
+        if m.group(2):
+            line_end = code.find("\n", m.end())
+            spans.append((m.start(), len(code) if line_end < 0 else line_end, name))
+    spans.sort()
+    return spans
+
+
+def functions_and_calls_from_code(code):
+    """Collect the function names defined in loaded source text and map each
+    of them (or MODULE_FUNCTION for top-level code) to the names it calls,
+    attributing every call to the innermost function body around it."""
+    defs = list(FUNC_DEF_PATTERN.finditer(code))
+    spans = _function_spans(code, defs)
+    functions = {m.group(1) or m.group(2) for m in defs}
+    def_names = {m.start(1) if m.group(1) else m.start(2) for m in defs}
+    result = defaultdict(list)
+    active, next_span = [], 0
+    for m in FUNC_CALL_PATTERN.finditer(code):
+        name, pos = m.group(1), m.start()
+        if name in CALL_KEYWORDS or pos in def_names:
+            continue
+        while next_span < len(spans) and spans[next_span][0] <= pos:
+            active.append(spans[next_span])
+            next_span += 1
+        # Bodies nest, so the innermost open one always ends first
+        while active and active[-1][1] <= pos:
+            active.pop()
+        result[active[-1][2] if active else MODULE_FUNCTION].append(name)
+    return functions, dict(result)
+
+
+def run_information_flow_analysis(project_dir, ignore_dirs , output_csv, file_extensions=('.js', '.jsx'), index=None, jobs=1,
+                                  progress=None):
     all_funcs = defaultdict(set)
-    all_calls = defaultdict(list)
+    all_calls = {}
     all_lengths = {}
 
-    for root, dirs, files in os.walk(project_dir):
-        dirs[:] = [d for d in dirs if d not in ignore_dirs]
-        
-        for file in files:
-            if file.endswith(file_extensions):
-                path = os.path.join(root, file)
-                print(f"Analyzing: {path}")
-                funcs, calls, length = extract_functions_and_calls(path)
-                all_funcs[path] = funcs
-                all_calls[path] = calls
-                all_lengths[path] = length
-
-    fan_in = defaultdict(int)
-    fan_out = defaultdict(int)
-    func_to_file = {}
+    paths = get_files_by_extensions(project_dir, ignore_dirs, file_extensions, index)
+    tracker = file_progress(progress, "information_flow", len(paths))
+    for path, (funcs, calls, length) in map_files(extract_functions_and_calls, paths, jobs):
+        tracker.advance(path)
+        all_funcs[path] = funcs
+        all_calls[path] = calls
+        all_lengths[path] = length
+    tracker.finish()
+
+    results = compute_information_flow(all_funcs, all_calls, all_lengths)
+    write_information_flow_csv(results, output_csv)
+
+    print(f"\n Information Flow Metrics saved to: {output_csv}")
 
+
+def build_call_graph(all_funcs, all_calls, graph=None):
+    """Add every file's definitions and calls to a CallGraph. ``all_calls``
+    maps each file to a ``{caller: callees}`` dict from
+    functions_and_calls_from_code."""
+    graph = graph if graph is not None else CallGraph()
     for file, funcs in all_funcs.items():
-        for func in funcs:
-            func_to_file[func] = file
+        graph.update_file(file, funcs, all_calls.get(file, {}))
+    return graph
+
+
+def _complexity(fan_in, fan_out):
+    FI = fan_in if fan_in > 0 else 1
+    FO = fan_out if fan_out > 0 else 1
+    return FI, FO, (FI * FO) ** 2
 
-    for file, calls in all_calls.items():
-        unique_calls = set(calls)
-        fan_out[file] = len(unique_calls)
-        for call in unique_calls:
-            if call in func_to_file:
-                fan_in[func_to_file[call]] += 1
 
+def file_flow_rows(graph, all_lengths):
+    """(file, length, fan-in, fan-out, complexity) rows from a call graph."""
     results = []
-    for file in all_funcs.keys():
-        L = all_lengths[file]
-        FI = fan_in[file] if fan_in[file] > 0 else 1
-        FO = fan_out[file] if fan_out[file] > 0 else 1
-        complexity = (FI * FO) ** 2
+    for file, L in all_lengths.items():
+        FI, FO, complexity = _complexity(*graph.file_fan(file))
         results.append((file, L, FI, FO, complexity))
+    return results
+
+
+def function_flow_rows(graph):
+    """(file, function, fan-in, fan-out, complexity) rows, one per function."""
+    return [(file, name) + _complexity(fan_in, fan_out)
+            for file, name, fan_in, fan_out in graph.function_fan()]
+
+
+def compute_information_flow(all_funcs, all_calls, all_lengths):
+    """Derive (file, length, fan-in, fan-out, complexity) rows from per-file
+    definitions and calls."""
+    return file_flow_rows(build_call_graph(all_funcs, all_calls), all_lengths)
+
+
+def _write_sorted(results, output_csv, columns, report_format, compression):
+    fields = [name for name, _ in columns]
+    with open_sink(output_csv, columns, report_format, compression) as sink:
+        sink.write_many(dict(zip(fields, row))
+                        for row in sorted(results, key=lambda x: x[-1], reverse=True))
+    return sink.path
+
+
+def write_information_flow_csv(results, output_csv, report_format="csv", compression=None):
+    """Write file rows, most complex first; returns the report path."""
+    return _write_sorted(results, output_csv, FLOW_COLUMNS, report_format, compression)
 
-    with open(output_csv, mode="w", newline='', encoding="utf-8") as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(["File", "Length", "FanIn", "FanOut", "Complexity"])
-        for file, L, FI, FO, C in sorted(results, key=lambda x: x[-1], reverse=True):
-            writer.writerow([file, L, FI, FO, C])
 
-    print(f"\n Information Flow Metrics saved to: {output_csv}")
\ No newline at end of file
+def write_function_flow_csv(results, output_csv, report_format="csv", compression=None):
+    """Write function rows, most complex first; returns the report path."""
+    return _write_sorted(results, output_csv, FUNCTION_FLOW_COLUMNS, report_format, compression)
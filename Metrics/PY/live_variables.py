@@ -1,8 +1,13 @@
 import os
 import re
 import csv
+from bisect import insort
 from collections import defaultdict
 
+from parallel import map_files
+from progress import file_progress
+from report_sinks import open_sink
+
 
 IGNORED_DEFAULT = {"node_modules", "dist", "build", "report", ".next", "scripts"}
 
@@ -31,7 +36,11 @@ class Scope:
         return visible
 
 
-def get_files_by_extensions(project_dir, ignore_dirs, file_extensions=('.js', '.jsx')):
+def get_files_by_extensions(project_dir, ignore_dirs, file_extensions=('.js', '.jsx'), index=None):
+    """List source files under project_dir. When a prebuilt ProjectIndex is
+    given its entries are reused instead of walking the tree again."""
+    if index is not None:
+        return index.paths(file_extensions)
     files_list = []
     for root, dirs, files in os.walk(project_dir):
         dirs[:] = [d for d in dirs if d not in ignore_dirs]
@@ -81,49 +90,194 @@ def parse_scopes(lines):
 
 
 def variables_per_line(lines, scope):
-    """Compute variables available at each line."""
+    """Compute variables available at each line.
+
+    Gives the same answer as calling ``scope.vars_at(i)`` for every line, but
+    in one sweep: a name becomes visible at its earliest definition in the
+    scope chain and stays visible, so the sorted list only changes on lines
+    that introduce a new name. Consecutive unchanged lines share one list.
+    """
+    first_defined = {}
+    s = scope
+    while s:
+        for name, line in s.definitions.items():
+            if line < first_defined.get(name, line + 1):
+                first_defined[name] = line
+        s = s.parent
+
+    starts = defaultdict(list)
+    for name, line in first_defined.items():
+        starts[line].append(name)
+
     results = {}
+    visible = []
     for i in range(1, len(lines) + 1):
-        results[i] = sorted(scope.vars_at(i))
+        new_names = starts.get(i)
+        if new_names:
+            visible = visible.copy()
+            for name in new_names:
+                insort(visible, name)
+        results[i] = visible
     return results
 
 
+def split_lines(code):
+    """Split loaded source text the same way ``readlines`` would."""
+    lines = code.split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+    return lines
+
+
+def analyze_lines(lines):
+    """Return per-line variable data for already-loaded source lines."""
+    scope_tree = parse_scopes(lines)
+    return variables_per_line(lines, scope_tree)
+
+
 def analyze_file(filepath):
     """Analyze one file and return per-line variable data."""
     with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
         lines = f.readlines()
-    scope_tree = parse_scopes(lines)
-    var_map = variables_per_line(lines, scope_tree)
-    return var_map
+    return analyze_lines(lines)
+
+
+LINE_FIELDS = ["File", "Line", "Variables", "Total"]
+RANGE_FIELDS = ["File", "Variable", "First_Line", "Last_Line"]
+LINE_COLUMNS = [("File", str), ("Line", int), ("Variables", str), ("Total", int)]
+RANGE_COLUMNS = [("File", str), ("Variable", str), ("First_Line", int), ("Last_Line", int)]
+OUTPUT_FORMATS = ("lines", "ranges")
+
+
+def live_variable_rows(filepath, var_map):
+    for line_num, vars_ in var_map.items():
+        yield {
+            "File": filepath,
+            "Line": line_num,
+            "Variables": ";".join(vars_),
+            "Total": len(vars_)
+        }
+
 
+def variable_ranges(var_map):
+    """Collapse a per-line variable map into (variable, first_line, last_line)
+    intervals, one per run of consecutive lines where the variable is live."""
+    ranges = []
+    open_since = {}
+    prev_vars = None
+    last_line = 0
+    for line_num, vars_ in var_map.items():
+        if vars_ is not prev_vars:
+            current = set(vars_)
+            for name in [n for n in open_since if n not in current]:
+                ranges.append((name, open_since.pop(name), last_line))
+            for name in vars_:
+                if name not in open_since:
+                    open_since[name] = line_num
+            prev_vars = vars_
+        last_line = line_num
+    for name, first in open_since.items():
+        ranges.append((name, first, last_line))
+    ranges.sort(key=lambda r: (r[1], r[0]))
+    return ranges
 
-def run_live_variable_analysis(project_dir, ignore_dirs, output_csv, file_extensions=('.js', '.jsx')):
+
+def range_rows(filepath, var_map):
+    # The row with an empty Variable records the file's line count so the
+    # reader can restore lines that have no live variables.
+    yield {"File": filepath, "Variable": "", "First_Line": 1, "Last_Line": len(var_map)}
+    for name, first, last in variable_ranges(var_map):
+        yield {"File": filepath, "Variable": name, "First_Line": first, "Last_Line": last}
+
+
+class LiveVariableWriter:
+    """Stream live variable results to a report one file at a time.
+
+    ``output_format`` is "lines" (one row per source line, the classic
+    report) or "ranges" (one row per variable interval, see
+    ``expand_live_variable_ranges`` to turn it back into lines).
+    ``report_format``/``compression`` pick the file type (see report_sinks);
+    the written file is ``path``.
+    """
+
+    def __init__(self, output_csv, output_format="lines", report_format="csv", compression=None):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown live variable format: {output_format}")
+        self.output_format = output_format
+        columns = LINE_COLUMNS if output_format == "lines" else RANGE_COLUMNS
+        self._sink = open_sink(output_csv, columns, report_format, compression)
+        self.path = self.output_csv = self._sink.path
+
+    def write_file(self, filepath, var_map):
+        if self.output_format == "lines":
+            self._sink.write_many(live_variable_rows(filepath, var_map))
+        else:
+            self._sink.write_many(range_rows(filepath, var_map))
+
+    def close(self):
+        self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def expand_live_variable_ranges(ranges_csv, file=None):
+    """Read a range-encoded report and yield per-line rows (same fields as
+    the "lines" format) for every file, or only for ``file``."""
+    def expand(filepath, line_count, ranges):
+        starts, ends = defaultdict(list), defaultdict(list)
+        for name, first, last in ranges:
+            starts[first].append(name)
+            ends[last].append(name)
+        visible = []
+        for line_num in range(1, line_count + 1):
+            if line_num in starts:
+                visible = visible.copy()
+                for name in starts[line_num]:
+                    insort(visible, name)
+            yield {"File": filepath, "Line": line_num,
+                   "Variables": ";".join(visible), "Total": len(visible)}
+            if line_num in ends:
+                visible = [n for n in visible if n not in ends[line_num]]
+
+    current, line_count, ranges = None, 0, []
+    with open(ranges_csv, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if file is not None and row["File"] != file:
+                continue
+            if row["File"] != current:
+                if current is not None:
+                    yield from expand(current, line_count, ranges)
+                current, line_count, ranges = row["File"], 0, []
+            if row["Variable"]:
+                ranges.append((row["Variable"], int(row["First_Line"]), int(row["Last_Line"])))
+            else:
+                line_count = int(row["Last_Line"])
+    if current is not None:
+        yield from expand(current, line_count, ranges)
+
+
+def run_live_variable_analysis(project_dir, ignore_dirs, output_csv, file_extensions=('.js', '.jsx'), index=None, jobs=1,
+                               output_format="lines", progress=None):
     """Run live variable analysis for files matching file_extensions and export CSV."""
     ignore_dirs = ignore_dirs or IGNORED_DEFAULT
-    js_files = get_files_by_extensions(project_dir, ignore_dirs, file_extensions)
+    js_files = get_files_by_extensions(project_dir, ignore_dirs, file_extensions, index)
 
     if not js_files:
         print(f"No files found for extensions: {file_extensions}")
         return
 
     os.makedirs(os.path.dirname(output_csv), exist_ok=True)
-    all_results = []
 
     print("\nStarting Live Variable Analysis...\n")
-    for filepath in js_files:
-        print(f"Analyzing: {filepath}")
-        var_map = analyze_file(filepath)
-        for line_num, vars_ in var_map.items():
-            all_results.append({
-                "File": filepath,
-                "Line": line_num,
-                "Variables": ";".join(vars_),
-                "Total": len(vars_)
-            })
-
-    with open(output_csv, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["File", "Line", "Variables", "Total"])
-        writer.writeheader()
-        writer.writerows(all_results)
-
-    print(f"\nLive Variable report saved to: {output_csv}")
\ No newline at end of file
+    tracker = file_progress(progress, "live_variables", len(js_files))
+    with LiveVariableWriter(output_csv, output_format) as writer:
+        for filepath, var_map in map_files(analyze_file, js_files, jobs):
+            tracker.advance(filepath)
+            writer.write_file(filepath, var_map)
+    tracker.finish()
+
+    print(f"\nLive Variable report saved to: {output_csv}")
@@ -0,0 +1,109 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Weighted scheduling reorders at most this many batches per worker at a
+# time, which bounds the results held back to restore input order
+WINDOW_BATCHES = 8
+
+
+def resolve_jobs(jobs):
+    """Normalise a --jobs value: 0 or negative means one worker per CPU."""
+    if jobs is None:
+        return 1
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def _chunksize(count, jobs):
+    # A few batches per worker keeps the pool balanced without paying the
+    # IPC cost of sending files one at a time.
+    return max(1, min(64, count // (jobs * 4)))
+
+
+def _call_batch(func, batch):
+    return [func(path) for path in batch]
+
+
+def _weighted_batches(paths, weights, jobs, chunksize, window):
+    """Group path indices into batches. Paths are taken ``window`` at a time
+    in input order, and each window is batched heaviest first. A batch is
+    closed once it holds ``chunksize`` files or a fair share of the
+    window's weight, so big files travel alone and small ones are still
+    sent in bulk."""
+    batches = []
+    for start in range(0, len(paths), window):
+        order = sorted(range(start, min(start + window, len(paths))), key=lambda i: (-weights[i], i))
+        share = max(1, sum(weights[i] for i in order) // (jobs * 4))
+        batch, batch_weight = [], 0
+        for i in order:
+            batch.append(i)
+            batch_weight += weights[i]
+            if len(batch) >= chunksize or batch_weight >= share:
+                batches.append(batch)
+                batch, batch_weight = [], 0
+        if batch:
+            batches.append(batch)
+    return batches
+
+
+def _in_input_order(executor, func, paths, batches, max_in_flight):
+    """Run ``batches`` with at most ``max_in_flight`` submitted at a time and
+    yield their results in the order of ``paths``. A result is only held
+    until the paths before it are done, and those are in the same window."""
+    batches = iter(batches)
+    in_flight = deque()
+    pending = {}
+    next_index = 0
+
+    def submit():
+        batch = next(batches, None)
+        if batch is not None:
+            in_flight.append((batch, executor.submit(_call_batch, func, [paths[i] for i in batch])))
+
+    for _ in range(max_in_flight):
+        submit()
+    while in_flight:
+        batch, future = in_flight.popleft()
+        pending.update(zip(batch, future.result()))
+        submit()
+        while next_index in pending:
+            yield paths[next_index], pending.pop(next_index)
+            next_index += 1
+
+
+def map_files(func, paths, jobs=1, chunksize=None, weights=None):
+    """Yield ``(path, func(path))`` for every path, in input order.
+
+    With ``jobs`` > 1 the calls are spread over a process pool in chunked
+    batches. Results are still yielded in the order of ``paths`` so merged
+    totals and report rows do not depend on the worker count. ``func`` must
+    be a module-level function so it can be pickled.
+
+    ``weights`` (e.g. file sizes, one per path) make the pool start each
+    window of WINDOW_BATCHES * ``chunksize`` * ``jobs`` paths with its
+    heaviest files, so a big file does not leave one worker running long
+    after the others are idle. Results that finish ahead of their turn are
+    held until the earlier paths of their window are done.
+    """
+    paths = list(paths)
+    jobs = min(resolve_jobs(jobs), len(paths))
+    if jobs <= 1:
+        for path in paths:
+            yield path, func(path)
+        return
+
+    if chunksize is None:
+        chunksize = _chunksize(len(paths), jobs)
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    try:
+        if weights is None:
+            yield from zip(paths, executor.map(func, paths, chunksize=chunksize))
+            return
+
+        batches = _weighted_batches(paths, weights, jobs, chunksize, WINDOW_BATCHES * chunksize * jobs)
+        yield from _in_input_order(executor, func, paths, batches, jobs * 4)
+    finally:
+        # Drop batches that have not started if the consumer stops early
+        executor.shutdown(wait=True, cancel_futures=True)
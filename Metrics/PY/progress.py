@@ -0,0 +1,124 @@
+import time
+import threading
+from contextlib import contextmanager
+
+
+class ProgressBus:
+    """Fan-out of structured progress events to any number of sinks.
+
+    Events are plain dicts with a ``type`` of ``phase_start``, ``phase_end``
+    or ``progress``. A sink is any callable taking one event; sinks must be
+    cheap, they run on the analysis thread.
+    """
+
+    def __init__(self, *sinks):
+        self._sinks = list(sinks)
+
+    def subscribe(self, sink):
+        self._sinks.append(sink)
+        return sink
+
+    def emit(self, type_, **data):
+        event = {"type": type_, "time": time.time(), **data}
+        for sink in self._sinks:
+            sink(event)
+
+    @contextmanager
+    def phase(self, name, **data):
+        start = time.perf_counter()
+        self.emit("phase_start", phase=name, **data)
+        try:
+            yield
+        finally:
+            self.emit("phase_end", phase=name, elapsed_sec=round(time.perf_counter() - start, 3))
+
+
+class FileProgress:
+    """Counts finished files of one phase and emits progress events with
+    throughput and an ETA."""
+
+    def __init__(self, bus, phase, total):
+        self.bus = bus
+        self.phase = phase
+        self.total = total
+        self.done = 0
+        self._start = time.perf_counter()
+        bus.emit("phase_start", phase=phase, total=total)
+
+    def advance(self, path=None, cached=False):
+        self.done += 1
+        elapsed = time.perf_counter() - self._start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate else None
+        self.bus.emit("progress", phase=self.phase, done=self.done, total=self.total, file=path,
+                      cached=cached, files_per_sec=round(rate, 2),
+                      eta_sec=round(eta, 1) if eta is not None else None)
+
+    def finish(self):
+        self.bus.emit("phase_end", phase=self.phase, done=self.done, total=self.total,
+                      elapsed_sec=round(time.perf_counter() - self._start, 3))
+
+
+class _NullProgress:
+    def advance(self, path=None, cached=False):
+        pass
+
+    def finish(self):
+        pass
+
+
+_NULL_PROGRESS = _NullProgress()
+
+
+def file_progress(bus, phase, total):
+    """Return a FileProgress for ``bus``, or a no-op tracker if bus is None."""
+    if bus is None:
+        return _NULL_PROGRESS
+    return FileProgress(bus, phase, total)
+
+
+@contextmanager
+def phase(bus, name, **data):
+    """``bus.phase`` that also accepts ``bus=None``."""
+    if bus is None:
+        yield
+    else:
+        with bus.phase(name, **data):
+            yield
+
+
+class RateLimitedSink:
+    """Forward phase events immediately but at most one ``progress`` event
+    per ``min_interval`` seconds (plus the last one of each phase)."""
+
+    def __init__(self, callback, min_interval=1.0):
+        self.callback = callback
+        self.min_interval = min_interval
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        if event["type"] == "progress" and event["done"] < event["total"]:
+            with self._lock:
+                now = time.monotonic()
+                if now - self._last < self.min_interval:
+                    return
+                self._last = now
+        self.callback(event)
+
+
+def format_event(event):
+    if event["type"] == "phase_start":
+        total = f" ({event['total']} files)" if event.get("total") is not None else ""
+        return f"[{event['phase']}] started{total}"
+    if event["type"] == "phase_end":
+        return f"[{event['phase']}] finished in {event['elapsed_sec']}s"
+    eta = f", ETA {event['eta_sec']}s" if event.get("eta_sec") is not None else ""
+    return (f"[{event['phase']}] {event['done']}/{event['total']} files "
+            f"({event['files_per_sec']} files/s{eta})")
+
+
+def console_sink(min_interval=1.0):
+    """Print progress to stdout, rate limited so huge runs are not slowed
+    down by terminal output."""
+    return RateLimitedSink(lambda event: print(format_event(event)), min_interval)
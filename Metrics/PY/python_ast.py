@@ -0,0 +1,309 @@
+import ast
+import warnings
+from bisect import bisect_right, insort
+from collections import Counter, defaultdict
+
+from call_graph import MODULE_FUNCTION
+
+# Operator symbols for the ast operator node classes
+_OP_SYMBOLS = {
+    ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.MatMult: "@", ast.Div: "/",
+    ast.Mod: "%", ast.Pow: "**", ast.LShift: "<<", ast.RShift: ">>",
+    ast.BitOr: "|", ast.BitXor: "^", ast.BitAnd: "&", ast.FloorDiv: "//",
+    ast.Invert: "~", ast.Not: "not", ast.UAdd: "+", ast.USub: "-",
+    ast.And: "and", ast.Or: "or",
+    ast.Eq: "==", ast.NotEq: "!=", ast.Lt: "<", ast.LtE: "<=", ast.Gt: ">",
+    ast.GtE: ">=", ast.Is: "is", ast.IsNot: "is not", ast.In: "in", ast.NotIn: "not in",
+}
+
+# Keyword or punctuation a node contributes once, wherever it appears
+_NODE_OPERATORS = {
+    ast.FunctionDef: "def", ast.AsyncFunctionDef: "async def", ast.ClassDef: "class",
+    ast.Return: "return", ast.Delete: "del", ast.For: "for", ast.AsyncFor: "async for",
+    ast.While: "while", ast.If: "if", ast.With: "with", ast.AsyncWith: "async with",
+    ast.Raise: "raise", ast.Try: "try", ast.Assert: "assert", ast.Import: "import",
+    ast.ImportFrom: "from", ast.Global: "global", ast.Nonlocal: "nonlocal",
+    ast.Pass: "pass", ast.Break: "break", ast.Continue: "continue",
+    ast.NamedExpr: ":=", ast.Lambda: "lambda", ast.IfExp: "if", ast.Await: "await",
+    ast.Yield: "yield", ast.YieldFrom: "yield from", ast.Call: "()",
+    ast.Attribute: ".", ast.Subscript: "[]", ast.Starred: "*", ast.Slice: ":",
+    ast.List: "[]", ast.ListComp: "[]", ast.Dict: "{}", ast.DictComp: "{}",
+    ast.Set: "{}", ast.SetComp: "{}", ast.ExceptHandler: "except",
+    ast.comprehension: "for", ast.keyword: "=",
+}
+if hasattr(ast, "Match"):
+    _NODE_OPERATORS.update({ast.Match: "match", ast.match_case: "case"})
+if hasattr(ast, "TryStar"):
+    _NODE_OPERATORS[ast.TryStar] = "try"
+
+_FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+_DOCSTRING_OWNERS = (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)
+_SCOPE_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef,
+                ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+
+def parse(code):
+    """Parse Python source, or return None when it is not valid Python 3
+    (old Python 2 files, templates, null bytes, absurd nesting)."""
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return ast.parse(code)
+    except (SyntaxError, ValueError, RecursionError):
+        return None
+
+
+class _Scope:
+    def __init__(self, parent, start_line, end_line, function=MODULE_FUNCTION):
+        self.parent = parent
+        self.start_line = start_line
+        self.end_line = end_line
+        # The def whose calls this scope's calls count as
+        self.function = function
+        self.definitions = {}
+        self.declared_elsewhere = set()
+
+    def add_var(self, name, line):
+        if name not in self.declared_elsewhere and line < self.definitions.get(name, line + 1):
+            self.definitions[name] = line
+
+
+# The name, if any, each kind of node binds in the scope it belongs to
+_BINDERS = {
+    ast.Name: lambda node: node.id if type(node.ctx) is ast.Store else None,
+    ast.FunctionDef: lambda node: node.name,
+    ast.AsyncFunctionDef: lambda node: node.name,
+    ast.ClassDef: lambda node: node.name,
+    ast.alias: lambda node: None if node.name == "*" else node.asname or node.name.split(".")[0],
+    ast.ExceptHandler: lambda node: node.name,
+    ast.arg: lambda node: node.arg,
+}
+if hasattr(ast, "Match"):
+    _BINDERS.update({
+        ast.MatchAs: lambda node: node.name,
+        ast.MatchStar: lambda node: node.name,
+        ast.MatchMapping: lambda node: node.rest,
+    })
+
+
+def tree_metrics(tree, line_count):
+    """Walk the syntax tree once and collect Halstead operator and operand
+    Counters, defined function names, called names grouped by the enclosing
+    def (or MODULE_FUNCTION at top level), the docstring statements and the
+    scopes with the names bound in each.
+
+    Keywords, operator symbols and punctuation such as calls and subscripts
+    are operators; names, attributes, parameters and literals are operands.
+    Docstrings count as neither. Functions include methods and lambdas bound
+    to a name; calls are the called name or attribute, as in
+    information_flow.
+
+    Each function, lambda, class and comprehension gets its own scope
+    spanning its source lines. Class bodies are not visible from the
+    functions nested in them, so a scope's parent is its nearest enclosing
+    non-class scope.
+    """
+    operators, operands = Counter(), Counter()
+    functions = set()
+    function_calls = defaultdict(list)
+    docstrings = []
+    skipped = set()
+    module = _Scope(None, 1, line_count)
+    scopes = [module]
+    stack = [(tree, module, module, 1)]
+
+    while stack:
+        node, scope, parent, line = stack.pop()
+        kind = type(node)
+        symbol = _NODE_OPERATORS.get(kind)
+        if symbol:
+            operators[symbol] += 1
+
+        if kind in _DOCSTRING_OWNERS and node.body:
+            first = node.body[0]
+            if (type(first) is ast.Expr and type(first.value) is ast.Constant
+                    and isinstance(first.value.value, str)):
+                docstrings.append(first)
+                skipped.add(id(first.value))
+
+        if kind is ast.Name:
+            operands[node.id] += 1
+        elif kind is ast.Constant:
+            if id(node) not in skipped:
+                operands[repr(node.value)] += 1
+        elif kind is ast.Attribute:
+            operands[node.attr] += 1
+        elif kind is ast.arg:
+            operands[node.arg] += 1
+        elif kind in _FUNCTION_NODES:
+            operands[node.name] += 1
+            functions.add(node.name)
+        elif kind is ast.ClassDef:
+            operands[node.name] += 1
+        elif kind is ast.Call:
+            func = node.func
+            callee = None
+            if type(func) is ast.Name:
+                callee = func.id
+            elif type(func) is ast.Attribute:
+                callee = func.attr
+            if callee is not None:
+                function_calls[scope.function].append(callee)
+        elif kind is ast.alias:
+            operands[node.name] += 1
+            if node.asname:
+                operators["as"] += 1
+                operands[node.asname] += 1
+        elif kind is ast.keyword:
+            if node.arg:
+                operands[node.arg] += 1
+            else:
+                operators["**"] += 1
+        elif kind in (ast.Global, ast.Nonlocal):
+            operands.update(node.names)
+        elif kind is ast.ExceptHandler:
+            if node.name:
+                operands[node.name] += 1
+        elif kind is ast.BinOp or kind is ast.UnaryOp:
+            operators[_OP_SYMBOLS[type(node.op)]] += 1
+        elif kind is ast.BoolOp:
+            operators[_OP_SYMBOLS[type(node.op)]] += len(node.values) - 1
+        elif kind is ast.Compare:
+            for op in node.ops:
+                operators[_OP_SYMBOLS[type(op)]] += 1
+        elif kind is ast.Assign:
+            operators["="] += len(node.targets)
+            if type(node.value) is ast.Lambda:
+                functions.update(t.id for t in node.targets if type(t) is ast.Name)
+        elif kind is ast.AugAssign:
+            operators[_OP_SYMBOLS[type(node.op)] + "="] += 1
+        elif kind is ast.AnnAssign:
+            operators[":"] += 1
+            if node.value is not None:
+                operators["="] += 1
+        elif kind is ast.ImportFrom:
+            operators["import"] += 1
+            if node.module:
+                operands[node.module] += 1
+        elif kind in (ast.For, ast.AsyncFor, ast.comprehension):
+            operators["in"] += 1
+            if getattr(node, "ifs", None):
+                operators["if"] += len(node.ifs)
+        elif kind is ast.IfExp:
+            operators["else"] += 1
+        elif kind is ast.Try or kind is getattr(ast, "TryStar", None):
+            if node.finalbody:
+                operators["finally"] += 1
+
+        # An ``else`` branch that is not an ``elif``
+        if kind in (ast.If, ast.For, ast.AsyncFor, ast.While, ast.Try) and node.orelse:
+            if not (kind is ast.If and len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If)):
+                operators["else"] += 1
+
+        line = getattr(node, "lineno", line)
+        binder = _BINDERS.get(kind)
+        if binder is not None:
+            name = binder(node)
+            if name:
+                scope.add_var(name, line)
+        elif kind is ast.Global or kind is ast.Nonlocal:
+            scope.declared_elsewhere.update(node.names)
+
+        if kind not in _SCOPE_NODES:
+            stack.extend((child, scope, parent, line) for child in ast.iter_child_nodes(node))
+            continue
+
+        inner = _Scope(parent, node.lineno, node.end_lineno or node.lineno,
+                       node.name if kind in _FUNCTION_NODES else scope.function)
+        scopes.append(inner)
+        inner_parent = parent if kind is ast.ClassDef else inner
+        # Decorators, defaults and base classes are evaluated outside
+        outer = list(getattr(node, "decorator_list", ()))
+        if kind is ast.ClassDef:
+            outer += node.bases + [k.value for k in node.keywords]
+        elif hasattr(node, "args"):
+            outer += node.args.defaults + [d for d in node.args.kw_defaults if d is not None]
+        outer_ids = {id(n) for n in outer}
+
+        for child in ast.iter_child_nodes(node):
+            if id(child) in outer_ids:
+                stack.append((child, scope, parent, line))
+            else:
+                stack.append((child, inner, inner_parent, line))
+    return operators, operands, functions, dict(function_calls), docstrings, scopes
+
+
+def variables_per_line(scopes, line_count):
+    """Per-line live variables: a name is live from the line it is first
+    bound until the end of its scope, and visible from nested scopes. Lines
+    with the same visible names share one sorted list."""
+    innermost = [scopes[0]] * (line_count + 1)
+    # Scopes are created outer-first, so inner scopes overwrite their parents
+    for scope in scopes[1:]:
+        for i in range(max(1, scope.start_line), min(line_count, scope.end_line) + 1):
+            innermost[i] = scope
+
+    ordered = {}
+    for scope in scopes:
+        pairs = sorted((line, name) for name, line in scope.definitions.items())
+        ordered[id(scope)] = ([line for line, _ in pairs], [name for _, name in pairs])
+
+    results = {}
+    shared = {}
+    for i in range(1, line_count + 1):
+        chain = []
+        scope = innermost[i]
+        while scope is not None:
+            lines, _ = ordered[id(scope)]
+            chain.append((scope, bisect_right(lines, i)))
+            scope = scope.parent
+        key = tuple((id(s), n) for s, n in chain)
+        visible = shared.get(key)
+        if visible is None:
+            names = set()
+            for s, n in chain:
+                names.update(ordered[id(s)][1][:n])
+            visible = []
+            for name in names:
+                insort(visible, name)
+            shared[key] = visible
+        results[i] = visible
+    return results
+
+
+def code_lines(lines, docstrings):
+    """Number of lines that are not blank, comment-only or docstring."""
+    skip = set()
+    for node in docstrings:
+        skip.update(range(node.lineno, (node.end_lineno or node.lineno) + 1))
+    loc = 0
+    for i, line in enumerate(lines, start=1):
+        stripped = line.strip()
+        if stripped and not stripped.startswith("#") and i not in skip:
+            loc += 1
+    return loc
+
+
+def analyze_python(code, lines):
+    """Parse Python source once and derive every metric from the same tree.
+    ``lines`` is the source split into lines. Returns the analysis engine's
+    per-file result dict, or None when the code does not parse."""
+    tree = parse(code)
+    if tree is None:
+        return None
+
+    try:
+        ops, opnds, funcs, function_calls, docstrings, scopes = tree_metrics(tree, len(lines))
+        variables = variables_per_line(scopes, len(lines))
+    except RecursionError:
+        return None
+
+    return {
+        "ops": ops,
+        "opnds": opnds,
+        "loc": code_lines(lines, docstrings),
+        "functions": funcs,
+        "function_calls": function_calls,
+        "length": len(code.splitlines()),
+        "variables": variables,
+    }
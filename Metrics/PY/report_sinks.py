@@ -0,0 +1,155 @@
+import os
+import csv
+import gzip
+import json
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = pq = None
+
+REPORT_FORMATS = ("csv", "jsonl", "parquet")
+# gzip for the text formats; Parquet codecs are passed through to pyarrow
+TEXT_COMPRESSIONS = ("gzip",)
+PARQUET_COMPRESSIONS = ("snappy", "zstd", "gzip", "brotli", "lz4")
+# Rows buffered per Parquet row group
+PARQUET_ROW_GROUP = 10000
+
+_EXTENSIONS = {"csv": ".csv", "jsonl": ".jsonl", "parquet": ".parquet"}
+
+
+def report_path(path, report_format="csv", compression=None):
+    """``path`` with the extension of the chosen format, e.g.
+    ``halstead_report.csv`` -> ``halstead_report.jsonl.gz``."""
+    base, _ = os.path.splitext(path)
+    ext = _EXTENSIONS[report_format]
+    if compression and report_format != "parquet":
+        ext += ".gz"
+    return base + ext
+
+
+class ReportSink:
+    """Write report rows to disk as they are produced.
+
+    ``columns`` is a list of ``(name, type)`` pairs with type ``int``,
+    ``float`` or ``str``; rows are dicts keyed by column name. Sinks are
+    context managers and must be closed to finish the file.
+    """
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self.fields = [name for name, _ in columns]
+        self.rows = 0
+
+    def write(self, row):
+        self.write_many((row,))
+
+    def write_many(self, rows):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _open_text(path, compression):
+    if compression == "gzip":
+        return gzip.open(path, "wt", newline="", encoding="utf-8")
+    return open(path, "w", newline="", encoding="utf-8")
+
+
+class CsvSink(ReportSink):
+    def __init__(self, path, columns, compression=None):
+        super().__init__(path, columns)
+        self._f = _open_text(path, compression)
+        self._writer = csv.DictWriter(self._f, fieldnames=self.fields)
+        self._writer.writeheader()
+
+    def write_many(self, rows):
+        for row in rows:
+            self._writer.writerow(row)
+            self.rows += 1
+
+    def close(self):
+        self._f.close()
+
+
+def _typed(row, columns):
+    """Coerce a row's values to the column types; missing or empty numbers
+    become None."""
+    typed = {}
+    for name, type_ in columns:
+        value = row.get(name)
+        if value is None or (value == "" and type_ is not str):
+            typed[name] = None
+        else:
+            typed[name] = type_(value)
+    return typed
+
+
+class JsonlSink(ReportSink):
+    def __init__(self, path, columns, compression=None):
+        super().__init__(path, columns)
+        self._f = _open_text(path, compression)
+
+    def write_many(self, rows):
+        for row in rows:
+            self._f.write(json.dumps(_typed(row, self.columns)))
+            self._f.write("\n")
+            self.rows += 1
+
+    def close(self):
+        self._f.close()
+
+
+class ParquetSink(ReportSink):
+    """Parquet with one typed column per field, written a row group at a
+    time so memory stays bounded."""
+
+    _ARROW_TYPES = {int: "int64", float: "float64", str: "string"}
+
+    def __init__(self, path, columns, compression="snappy"):
+        if pa is None:
+            raise ImportError("Parquet reports need pyarrow; install it or pick another format")
+        super().__init__(path, columns)
+        self._schema = pa.schema([(name, getattr(pa, self._ARROW_TYPES[type_])())
+                                  for name, type_ in columns])
+        self._writer = pq.ParquetWriter(path, self._schema, compression=compression or "none")
+        self._pending = []
+
+    def write_many(self, rows):
+        for row in rows:
+            self._pending.append(_typed(row, self.columns))
+            self.rows += 1
+            if len(self._pending) >= PARQUET_ROW_GROUP:
+                self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._writer.write_table(pa.Table.from_pylist(self._pending, schema=self._schema))
+            self._pending = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+_SINKS = {"csv": CsvSink, "jsonl": JsonlSink, "parquet": ParquetSink}
+
+
+def open_sink(path, columns, report_format="csv", compression=None):
+    """Open a sink for ``path`` (its extension is replaced to match the
+    format); the final file name is ``sink.path``."""
+    if report_format not in REPORT_FORMATS:
+        raise ValueError(f"Unknown report format: {report_format}")
+    allowed = PARQUET_COMPRESSIONS if report_format == "parquet" else TEXT_COMPRESSIONS
+    if compression and compression not in allowed:
+        raise ValueError(f"Unsupported compression for {report_format}: {compression}")
+    return _SINKS[report_format](report_path(path, report_format, compression), columns, compression)
@@ -0,0 +1,103 @@
+import os
+import json
+import sqlite3
+import hashlib
+from collections import Counter
+
+# Bump whenever the per-file results produced by the analysis engine change,
+# so stale cache entries are never reused.
+ANALYZER_VERSION = "6"
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def result_to_json(result):
+    """The analysis part of an analyze_source result as JSON-ready data."""
+    return {
+        "ops": result["ops"],
+        "opnds": result["opnds"],
+        "loc": result["loc"],
+        "functions": sorted(result["functions"]),
+        "function_calls": result["function_calls"],
+        "length": result["length"],
+        "variables": result["variables"],
+    }
+
+
+def result_from_json(raw):
+    """Inverse of ``result_to_json``."""
+    return {
+        "ops": Counter(raw["ops"]),
+        "opnds": Counter(raw["opnds"]),
+        "loc": raw["loc"],
+        "functions": set(raw["functions"]),
+        "function_calls": raw["function_calls"],
+        "length": raw["length"],
+        # JSON object keys are strings; line numbers are ints everywhere else
+        "variables": {int(line): vars_ for line, vars_ in raw["variables"].items()},
+    }
+
+
+def _encode(result):
+    return json.dumps(result_to_json(result))
+
+
+def _decode(data):
+    return result_from_json(json.loads(data))
+
+
+class ResultCache:
+    """On-disk store of per-file analysis results keyed by content hash.
+
+    Entries are keyed by ``ANALYZER_VERSION`` plus the SHA-256 of the file
+    bytes, so a renamed or moved file still hits and an analyzer change
+    invalidates everything. Writes are batched until ``flush``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _key(digest):
+        return f"{ANALYZER_VERSION}:{digest}"
+
+    def get(self, digest):
+        row = self._conn.execute(
+            "SELECT data FROM results WHERE key = ?", (self._key(digest),)
+        ).fetchone()
+        return _decode(row[0]) if row else None
+
+    def put(self, digest, result):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO results (key, data) VALUES (?, ?)",
+            (self._key(digest), _encode(result)),
+        )
+
+    def flush(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+
+# One open cache per database path and process, so pool workers reuse their
+# connection across the files of a run. Keyed by pid as well because SQLite
+# connections must not be shared with forked children.
+_open_caches = {}
+
+
+def open_cache(path):
+    key = (os.getpid(), path)
+    cache = _open_caches.get(key)
+    if cache is None:
+        cache = _open_caches[key] = ResultCache(path)
+    return cache
@@ -0,0 +1,274 @@
+import os
+import time
+import math
+import random
+from statistics import NormalDist
+
+from analysis_engine import analyze_source
+from combined_reports import CombinedReports
+from parallel import resolve_jobs
+from report_sinks import open_sink
+
+# Every stratum gets at least this many files (when it has them), so each
+# one has its own variance estimate
+MIN_PER_STRATUM = 2
+# Files timed to turn a time budget into a sample size
+PILOT_FILES = 20
+# Graph and report writing on top of the per-file analysis the pilot times
+REPORT_OVERHEAD = 1.5
+OTHER = "(other)"
+
+# Per-file values that are summed into project totals, and the flow value
+# that is averaged
+TOTAL_METRICS = ("Volume", "Effort", "Bugs", "Lines_of_Code")
+MEAN_METRICS = ("Complexity",)
+
+ESTIMATE_COLUMNS = [("Metric", str), ("Kind", str), ("Estimate", float), ("Std_Error", float),
+                    ("CI_Low", float), ("CI_High", float), ("Sampled", int), ("Files", int)]
+
+
+def stratum_key(relpath, language):
+    """``(language, top-level directory)``; files at the root share ``.``."""
+    head, sep, _ = relpath.partition("/")
+    return language, head if sep else "."
+
+
+def stratify(index, max_strata=None):
+    """Index files grouped by stratum, in index order. Beyond ``max_strata``
+    the smallest directories of each language are pooled into one
+    ``(language, "(other)")`` stratum."""
+    strata = {}
+    for f in index:
+        relpath = os.path.relpath(f.path, index.root).replace(os.sep, "/")
+        strata.setdefault(stratum_key(relpath, f.language), []).append(f)
+    if max_strata is None or len(strata) <= max_strata:
+        return strata
+
+    languages = {lang for lang, _ in strata}
+    keep = max(max_strata - len(languages), 0)
+    largest = set(sorted(strata, key=lambda k: (-len(strata[k]), k))[:keep])
+    pooled = {}
+    for key, files in strata.items():
+        target = key if key in largest else (key[0], OTHER)
+        pooled.setdefault(target, []).extend(files)
+    return pooled
+
+
+def allocate(sizes, sample_size):
+    """Files to draw per stratum: MIN_PER_STRATUM each, the rest roughly in
+    proportion to the files a stratum has left, never more than it has."""
+    alloc = {k: min(MIN_PER_STRATUM, n) for k, n in sizes.items()}
+    remaining = sample_size - sum(alloc.values())
+    while remaining > 0:
+        room = {k: sizes[k] - alloc[k] for k in sizes if sizes[k] > alloc[k]}
+        if not room:
+            break
+        total_room = sum(room.values())
+        shares = {k: remaining * r / total_room for k, r in room.items()}
+        given = 0
+        for k in room:
+            extra = min(room[k], int(shares[k]))
+            alloc[k] += extra
+            given += extra
+        if not given:
+            # Every share is below one file: largest remainders first
+            for k in sorted(room, key=lambda k: (-shares[k], k))[:remaining]:
+                alloc[k] += 1
+                given += 1
+        remaining -= given
+    return alloc
+
+
+def minimum_size(index):
+    """Smallest sample that gives every language MIN_PER_STRATUM files
+    (or all of them, when it has fewer)."""
+    return sum(min(MIN_PER_STRATUM, n) for n in index.language_counts().values())
+
+
+def _budget_size(files, time_budget, jobs, prefilter, rng):
+    """Sample size that should fit in ``time_budget`` seconds, from the
+    analysis speed of a few randomly chosen files, and those files'
+    analyze_source results by path. The pilot files are part of the
+    sample, so they count towards it without further cost."""
+    start = time.perf_counter()
+    pilot = rng.sample(files, min(PILOT_FILES, len(files)))
+    analyzed = {f.path: analyze_source(f.path, prefilter=prefilter) for f in pilot}
+    elapsed = time.perf_counter() - start
+
+    seconds_per_byte = elapsed / max(sum(f.size for f in pilot), 1)
+    mean_size = sum(f.size for f in files) / len(files)
+    per_file = seconds_per_byte * mean_size * REPORT_OVERHEAD / resolve_jobs(jobs)
+    remaining = max(time_budget - elapsed, 0)
+    size = len(pilot) + int(remaining / per_file) if per_file > 0 else len(files)
+    return size, analyzed
+
+
+class SamplePlan:
+    """A stratified random sample of a project index.
+
+    ``index`` holds the sampled files in walk order, so it can be handed to
+    run_quality_metrics like a full index; ``sizes`` and ``sample`` give the
+    files per stratum in the project and in the sample.
+
+    Files in ``analyzed`` (the time budget pilot) are drawn first within
+    their stratum. The pilot is itself a uniform draw, so each stratum's
+    sample still is one; ``analyzed`` keeps the results of the pilot files
+    that made it into the sample, so they are not analyzed again.
+    """
+
+    def __init__(self, index, strata, alloc, rng, analyzed=None):
+        analyzed = analyzed or {}
+        self.root = index.root
+        self.sizes = {key: len(files) for key, files in strata.items()}
+        self.sample = {}
+        for key, files in strata.items():
+            pilot = [f for f in files if f.path in analyzed]
+            chosen = rng.sample(pilot, min(len(pilot), alloc[key]))
+            rest = [f for f in files if f.path not in analyzed]
+            self.sample[key] = chosen + rng.sample(rest, alloc[key] - len(chosen))
+        self.stratum = {f.path: key for key, files in self.sample.items() for f in files}
+        self.analyzed = {path: result for path, result in analyzed.items() if path in self.stratum}
+        chosen = [f for f in index if f.path in self.stratum]
+        self.index = type(index)(index.root, chosen)
+
+    @property
+    def files(self):
+        return sum(self.sizes.values())
+
+    @property
+    def sampled(self):
+        return len(self.stratum)
+
+    def fraction(self, language):
+        """Share of the files of ``language`` that are in the sample."""
+        keys = [k for k in self.sizes if k[0] == language]
+        return sum(len(self.sample[k]) for k in keys) / sum(self.sizes[k] for k in keys)
+
+
+def plan_sample(index, sample_size=None, time_budget=None, seed=0, jobs=1, prefilter="skip"):
+    """Draw a sample of ``sample_size`` files, or of as many as a
+    ``time_budget`` in seconds allows (capped by ``sample_size`` when both
+    are given), stratified by language and top-level directory.
+
+    A ``sample_size`` below minimum_size raises ValueError; a time budget
+    too short for it gets the minimum sample.
+    """
+    rng = random.Random(seed)
+    files = index.files()
+    if not files:
+        return SamplePlan(index, {}, {}, rng)
+    minimum = minimum_size(index)
+    if sample_size is not None and sample_size < minimum:
+        raise ValueError(f"A sample needs at least {minimum} files ({MIN_PER_STRATUM} per language), "
+                         f"got {sample_size}")
+    analyzed = None
+    if time_budget is not None:
+        budget_size, analyzed = _budget_size(files, time_budget, jobs, prefilter, rng)
+        if budget_size < minimum:
+            print(f"Time budget allows {budget_size} files; sampling the minimum of {minimum}")
+            budget_size = minimum
+        sample_size = budget_size if sample_size is None else min(sample_size, budget_size)
+    sample_size = min(sample_size, len(files))
+
+    strata = stratify(index, max(sample_size // MIN_PER_STRATUM, 1))
+    alloc = allocate({key: len(files) for key, files in strata.items()}, sample_size)
+    return SamplePlan(index, strata, alloc, rng, analyzed)
+
+
+def _variance(values):
+    if len(values) < 2:
+        return None
+    mean = sum(values) / len(values)
+    return sum((v - mean) ** 2 for v in values) / (len(values) - 1)
+
+
+def stratified_estimate(sizes, values, kind="total"):
+    """Stratified estimate of a project total (or per-file mean) and its
+    standard error from ``values`` sampled per stratum.
+
+    Strata whose sample is too small for a variance of its own use the
+    variance of all sampled values. For a mean, strata without values are
+    left out and the weights of the others rescaled.
+    """
+    pooled = _variance([v for vs in values.values() for v in vs]) or 0.0
+    observed = {k: vs for k, vs in values.items() if vs}
+    weight_total = sum(sizes[k] for k in observed) if kind == "mean" else 1
+    estimate = variance = 0.0
+    for key, vs in observed.items():
+        size, n = sizes[key], len(vs)
+        weight = size / weight_total
+        s2 = _variance(vs)
+        estimate += weight * sum(vs) / n
+        variance += weight ** 2 * (1 - n / size) * (pooled if s2 is None else s2) / n
+    return estimate, math.sqrt(variance)
+
+
+class SampledReports(CombinedReports):
+    """CombinedReports that also keep each sampled file's Halstead and flow
+    values and, in ``finish``, extrapolate them to the whole project.
+
+    Totals are sums of per-file values (a sampled file without a Halstead
+    row counts as zero, as it would in a full run); flow complexity is the
+    mean over files with a flow row. The sampled call graph only sees calls
+    from sampled files, so the cross-file part of each fan-in is scaled up
+    by the sampling fraction of the file's language.
+    """
+
+    def __init__(self, plan, output_dir, live_format="lines", report_format="csv", compression=None,
+                 approximate=False, confidence=0.95):
+        super().__init__(output_dir, live_format, report_format, compression, approximate)
+        self.plan = plan
+        self.confidence = confidence
+        self._values = {}
+        self.estimate = None
+
+    def add_file(self, filepath, metrics, result):
+        super().add_file(filepath, metrics, result)
+        if metrics:
+            values = self._values.setdefault(filepath, {})
+            values.update((name, metrics[name]) for name in TOTAL_METRICS)
+
+    def add_flow(self, rows, graph=None):
+        super().add_flow(rows, graph)
+        for file, _, fan_in, fan_out, complexity in rows:
+            if graph is not None and file in self.plan.stratum:
+                own = graph.file_self_fan_in(file)
+                fraction = self.plan.fraction(self.plan.stratum[file][0])
+                # _complexity counts a fan-in of 0 as 1
+                external = graph.file_fan(file)[0] - own
+                fan_in = max(own + external / fraction, 1)
+                complexity = (fan_in * fan_out) ** 2
+            self._values.setdefault(file, {})["Complexity"] = complexity
+
+    def _estimate(self):
+        plan = self.plan
+        z = NormalDist().inv_cdf((1 + self.confidence) / 2)
+        metrics = {}
+        for kind, names in (("total", TOTAL_METRICS), ("mean", MEAN_METRICS)):
+            for name in names:
+                values = {}
+                for key, files in plan.sample.items():
+                    got = (self._values.get(f.path, {}).get(name) for f in files)
+                    values[key] = [v or 0 for v in got] if kind == "total" else [v for v in got if v is not None]
+                estimate, std_error = stratified_estimate(plan.sizes, values, kind)
+                metrics[name] = {
+                    "kind": kind, "estimate": round(estimate, 2), "std_error": round(std_error, 2),
+                    "ci_low": round(max(estimate - z * std_error, 0), 2),
+                    "ci_high": round(estimate + z * std_error, 2),
+                    "sampled": sum(map(len, values.values())),
+                }
+        return {"files": plan.files, "sampled": plan.sampled, "strata": len(plan.sizes),
+                "confidence": self.confidence, "metrics": metrics}
+
+    def finish(self):
+        paths = super().finish()
+        self.estimate = self._estimate()
+        rows = [{"Metric": name, "Kind": m["kind"], "Estimate": m["estimate"], "Std_Error": m["std_error"],
+                 "CI_Low": m["ci_low"], "CI_High": m["ci_high"], "Sampled": m["sampled"],
+                 "Files": self.estimate["files"]}
+                for name, m in self.estimate["metrics"].items()]
+        with open_sink(os.path.join(self.output_dir, "sample_estimate.csv"), ESTIMATE_COLUMNS,
+                       self.report_format, self.compression) as sink:
+            sink.write_many(rows)
+        paths["sample_estimate"] = sink.path
+        return paths
@@ -0,0 +1,186 @@
+import os
+import gzip
+import json
+import heapq
+from collections import Counter
+
+from result_cache import ANALYZER_VERSION, result_to_json, result_from_json
+
+FORMAT = "qualitas-shard"
+FORMAT_VERSION = 1
+
+
+class ShardError(ValueError):
+    """Raised for shard files that cannot be read or merged together."""
+
+
+def shard_of(position, count):
+    """Index of the shard a file at ``position`` in the project index
+    belongs to. Files are dealt round robin so every shard gets a similar
+    mix of directories."""
+    return position % count
+
+
+def new_header(root, prefilter, shards=()):
+    return {
+        "format": FORMAT,
+        "version": FORMAT_VERSION,
+        "analyzer_version": ANALYZER_VERSION,
+        "prefilter": prefilter,
+        "root": root,
+        "shards": sorted(list(s) for s in shards),
+        # Per language: files in this shard and the index position of the
+        # first one, which is what language detection orders by
+        "languages": {},
+    }
+
+
+def add_language_file(header, language, order):
+    entry = header["languages"].setdefault(language, {"files": 0, "first": order})
+    entry["files"] += 1
+    entry["first"] = min(entry["first"], order)
+
+
+def merge_headers(a, b):
+    """Header of the union of two shards. Associative and commutative;
+    shards analyzed with different settings, or the same shard twice, are
+    rejected."""
+    for key in ("analyzer_version", "prefilter"):
+        if a[key] != b[key]:
+            raise ShardError(f"Shards differ in {key}: {a[key]!r} != {b[key]!r}")
+    overlap = {tuple(s) for s in a["shards"]} & {tuple(s) for s in b["shards"]}
+    if overlap:
+        raise ShardError(f"Shard(s) {sorted(overlap)} present in both inputs")
+    merged = new_header(a["root"], a["prefilter"], [tuple(s) for s in a["shards"] + b["shards"]])
+    for header in (a, b):
+        for language, entry in header["languages"].items():
+            target = merged["languages"].setdefault(language, {"files": 0, "first": entry["first"]})
+            target["files"] += entry["files"]
+            target["first"] = min(target["first"], entry["first"])
+    return merged
+
+
+def missing_shards(header):
+    """``(k, n)`` pairs not covered by ``header``, for every shard count seen."""
+    missing = []
+    for count in sorted({n for _, n in header["shards"]}):
+        present = {k for k, n in header["shards"] if n == count}
+        missing.extend((k, count) for k in range(count) if k not in present)
+    return missing
+
+
+def language_order(header):
+    """Languages by descending file count, ties by first appearance; the
+    order detect_languages gives on the whole project."""
+    languages = header["languages"]
+    return sorted(languages, key=lambda lang: (-languages[lang]["files"], languages[lang]["first"]))
+
+
+def make_record(relpath, order, language, result):
+    record = {"path": relpath, "order": order, "language": language}
+    if result.get("skipped"):
+        record["skipped"] = result["skipped"]
+    else:
+        record.update(digest=result["digest"], sampled=result["sampled"], result=result_to_json(result))
+    return record
+
+
+def record_result(record):
+    """The analyze_source style result stored in ``record``."""
+    if record.get("skipped"):
+        return {"skipped": record["skipped"], "digest": None, "cached": False}
+    result = result_from_json(record["result"])
+    result.update(digest=record["digest"], sampled=record["sampled"], cached=False)
+    return result
+
+
+class ShardWriter:
+    """Write a shard file: a header line, one line per file in index order
+    and a trailer with the operator/operand Counters and LOC per language.
+    Files are gzip-compressed JSON lines."""
+
+    def __init__(self, path, header):
+        self.path = path
+        self._tmp = f"{path}.tmp"
+        self._f = gzip.open(self._tmp, "wt", encoding="utf-8")
+        self._f.write(json.dumps(header) + "\n")
+        self.totals = {}
+        self._last = -1
+
+    def write(self, record):
+        if record["order"] <= self._last:
+            raise ShardError(f"Records out of order or duplicated at {record['path']}")
+        self._last = record["order"]
+        self._f.write(json.dumps(record) + "\n")
+        if "result" in record:
+            totals = self.totals.setdefault(record["language"], {"ops": Counter(), "opnds": Counter(), "loc": 0})
+            totals["ops"].update(record["result"]["ops"])
+            totals["opnds"].update(record["result"]["opnds"])
+            totals["loc"] += record["result"]["loc"]
+
+    def close(self):
+        self._f.write(json.dumps({"totals": self.totals}) + "\n")
+        self._f.close()
+        os.replace(self._tmp, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+            os.remove(self._tmp)
+
+
+def read_header(path):
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+    except (OSError, ValueError) as e:
+        raise ShardError(f"{path} is not a shard file: {e}")
+    if header.get("format") != FORMAT or header.get("version") != FORMAT_VERSION:
+        raise ShardError(f"{path} is not a version {FORMAT_VERSION} shard file")
+    return header
+
+
+def read_records(path):
+    """Yield the file records of a shard in index order."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        f.readline()
+        for line in f:
+            record = json.loads(line)
+            if "totals" in record:
+                return
+            yield record
+
+
+def merged_header(paths):
+    headers = [read_header(p) for p in paths]
+    if not headers:
+        raise ShardError("No shard files given")
+    merged = headers[0]
+    for header in headers[1:]:
+        merged = merge_headers(merged, header)
+    return merged
+
+
+def merged_records(paths):
+    """Records of several shards as one stream in index order. Each shard is
+    already sorted, so this only holds one record per shard in memory."""
+    last = None
+    for record in heapq.merge(*(read_records(p) for p in paths), key=lambda r: r["order"]):
+        if last is not None and record["order"] == last:
+            raise ShardError(f"{record['path']} appears in more than one shard")
+        last = record["order"]
+        yield record
+
+
+def merge_shards(paths, output):
+    """Merge shard files into one; the result reduces exactly like its
+    inputs."""
+    with ShardWriter(output, merged_header(paths)) as writer:
+        for record in merged_records(paths):
+            writer.write(record)
+    return output
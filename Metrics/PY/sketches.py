@@ -0,0 +1,59 @@
+import math
+import hashlib
+
+DEFAULT_PRECISION = 14
+
+
+def _hash64(item):
+    # Stable across processes and runs (unlike hash()), so sketches built on
+    # different workers can be merged
+    return int.from_bytes(hashlib.blake2b(item.encode("utf-8", "surrogatepass"), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """Distinct count estimate in a fixed ``2 ** precision`` bytes.
+
+    The relative standard error is about ``1.04 / sqrt(2 ** precision)``
+    (0.8% at the default precision of 14, 16 KiB). Small counts use linear
+    counting and are close to exact. Sketches of the same precision merge
+    by taking the register maximum, so the merge of two sketches estimates
+    the size of the union.
+    """
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        if not 4 <= precision <= 18:
+            raise ValueError(f"HyperLogLog precision must be in 4..18, got {precision}")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, item):
+        h = _hash64(item)
+        bits = 64 - self.precision
+        index = h >> bits
+        # Position of the leftmost 1 in the remaining bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    @property
+    def relative_error(self):
+        """Relative standard error of ``cardinality``."""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def cardinality(self):
+        m = len(self.registers)
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return estimate
@@ -0,0 +1,94 @@
+import os
+import re
+
+# Only this much of a file is read to classify it
+BLOCK_SIZE = 8192
+# A file whose first block has at least this share of characters on lines
+# longer than MINIFIED_LINE_LENGTH is treated as minified
+MINIFIED_LINE_LENGTH = 500
+MINIFIED_RATIO = 0.5
+# Share of control bytes (other than whitespace) that marks a file as binary
+BINARY_RATIO = 0.1
+# Sampled mode analyzes this much of a filtered file
+SAMPLE_BYTES = 64 * 1024
+
+BINARY, MINIFIED, GENERATED = "binary", "minified", "generated"
+# What to do with filtered files: leave them out, analyze a prefix, or
+# analyze them in full like any other file
+POLICIES = ("skip", "sample", "off")
+
+# A generator notice opens a line of the header, after comment punctuation
+# (``//``, ``#``, `` * ``) and at most a "this file is/was" lead-in
+GENERATED_MARKERS = re.compile(
+    rb"^\W*(?:@generated\b|code generated .* do not edit"
+    rb"|(?:this (?:file|code) (?:is|was|has been) )?(?:auto-?generated|automatically generated|generated by)\b"
+    rb"|do not edit\b)",
+    re.IGNORECASE | re.MULTILINE,
+)
+# Markers only count in the comments and docstring that open the file,
+# within this many bytes, where tools put them
+GENERATED_HEADER_BYTES = 1024
+# Blank lines, line comments, block comments and triple-quoted strings at
+# the start of a file; an unterminated one runs to the end of the header
+_LEADING_COMMENTS = re.compile(
+    rb"(?:\s+|(?://|#|--)[^\n]*|/\*.*?(?:\*/|\Z)|<!--.*?(?:-->|\Z)"
+    rb"|[rRuU]?(?:\"\"\".*?(?:\"\"\"|\Z)|'''.*?(?:'''|\Z)))*",
+    re.DOTALL,
+)
+MINIFIED_SUFFIXES = (".min.js", ".min.mjs", ".bundle.js", "-min.js")
+
+# Control bytes that do not occur in text files
+_BINARY_BYTES = bytes(c for c in range(32) if c not in b"\n\r\t\f\b\x1b")
+
+
+def classify_block(block, path=""):
+    """Classify a file from its first block of bytes: BINARY, MINIFIED,
+    GENERATED, or None for ordinary source."""
+    if not block:
+        return None
+    if b"\0" in block:
+        return BINARY
+    control = len(block) - len(block.translate(None, _BINARY_BYTES))
+    if control > BINARY_RATIO * len(block):
+        return BINARY
+
+    if path.lower().endswith(MINIFIED_SUFFIXES):
+        return MINIFIED
+    lines = block.split(b"\n")
+    long_chars = sum(len(line) for line in lines if len(line) > MINIFIED_LINE_LENGTH)
+    if long_chars >= MINIFIED_RATIO * len(block):
+        return MINIFIED
+
+    if GENERATED_MARKERS.search(leading_comments(block)):
+        return GENERATED
+    return None
+
+
+def leading_comments(block):
+    """The comment and docstring lines that open ``block``, up to
+    GENERATED_HEADER_BYTES."""
+    return _LEADING_COMMENTS.match(block[:GENERATED_HEADER_BYTES]).group()
+
+
+def classify_file(path):
+    """Classify a file by reading only its first block."""
+    try:
+        with open(path, "rb") as f:
+            return classify_block(f.read(BLOCK_SIZE), path)
+    except OSError:
+        return None
+
+
+def file_sizes(paths, index=None):
+    """Size in bytes of every path, taken from a ProjectIndex when given."""
+    known = {f.path: f.size for f in index} if index is not None else {}
+    sizes = []
+    for path in paths:
+        size = known.get(path)
+        if size is None:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = 0
+        sizes.append(size)
+    return sizes
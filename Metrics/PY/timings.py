@@ -0,0 +1,84 @@
+import time
+import heapq
+from contextlib import contextmanager
+
+# Slowest files kept per run
+TOP_FILES = 10
+
+
+class Timings:
+    """Wall time per phase of a run plus the slowest files.
+
+    Phases are named spans (``walk``, ``detect``, ``graph``, ``reports``...)
+    and accumulate when entered more than once, e.g. once per language.
+    Per-file stage times (``read``, ``tokenize``, ``scopes``, ``calls``;
+    measured by the worker that analyzed the file) are summed into the
+    phases of the same name and the ``top_n`` slowest files are kept with
+    their breakdown. Pass ``timings=None`` wherever a Timings is accepted to
+    switch instrumentation off.
+    """
+
+    def __init__(self, top_n=TOP_FILES):
+        self.top_n = top_n
+        self.phases = {}
+        self.files = 0
+        self._slowest = []
+        self._start = time.perf_counter()
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add_file(self, path, stages):
+        """Record one file's ``{stage: seconds}``."""
+        total = 0.0
+        for name, seconds in stages.items():
+            self.add(name, seconds)
+            total += seconds
+        self.files += 1
+        entry = (total, path, stages)
+        if len(self._slowest) < self.top_n:
+            heapq.heappush(self._slowest, entry)
+        elif total > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def to_dict(self):
+        return {
+            "total_sec": round(time.perf_counter() - self._start, 4),
+            "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+            "files": self.files,
+            "slowest_files": [
+                {"file": path, "seconds": round(total, 4),
+                 "stages": {name: round(seconds, 4) for name, seconds in stages.items()}}
+                for total, path, stages in sorted(self._slowest, key=lambda e: e[0], reverse=True)
+            ],
+        }
+
+
+def timed(stages, name, func, *args):
+    """``func(*args)``, adding its wall time to ``stages[name]`` unless
+    ``stages`` is None."""
+    if stages is None:
+        return func(*args)
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+
+
+@contextmanager
+def timing_phase(timings, name):
+    """``timings.phase`` that also accepts ``timings=None``."""
+    if timings is None:
+        yield
+    else:
+        with timings.phase(name):
+            yield
@@ -0,0 +1,154 @@
+import os
+import sys
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+
+# inotify event bits (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+
+_EVENT = struct.Struct("iIII")
+_O_NONBLOCK = os.O_NONBLOCK
+_O_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+
+# Sentinel returned by ``wait`` when the watcher lost track (e.g. the event
+# queue overflowed) and the whole tree has to be rescanned. Distinct from
+# every set, so it cannot be mistaken for "no changes"
+RESCAN = object()
+
+
+def _walk_dirs(root, ignore_dirs):
+    for current, dirs, _ in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if d not in ignore_dirs)
+        yield current
+
+
+class InotifyWatcher:
+    """Change notifications for a directory tree through Linux inotify.
+
+    Every directory gets a watch; directories created later are watched as
+    they appear. ``wait`` returns the set of paths (files or directories)
+    that changed, an empty set on timeout, or RESCAN. Raises OSError when
+    inotify is not available, so callers can fall back to PollingWatcher.
+    """
+
+    def __init__(self, root, ignore_dirs=()):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is not available on this platform")
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(_O_NONBLOCK | _O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.root = root
+        self.ignore_dirs = set(ignore_dirs)
+        self._dirs = {}
+        self._add_tree(root)
+
+    def _add_tree(self, top):
+        for path in _walk_dirs(top, self.ignore_dirs):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+            if wd >= 0:
+                self._dirs[wd] = path
+
+    def wait(self, timeout):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+                offset += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    return RESCAN
+                directory = self._dirs.get(wd)
+                if mask & IN_IGNORED:
+                    self._dirs.pop(wd, None)
+                    continue
+                if directory is None:
+                    continue
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    changed.add(directory)
+                    continue
+                path = os.path.join(directory, os.fsdecode(name))
+                if name and os.fsdecode(name) in self.ignore_dirs:
+                    continue
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)
+                changed.add(path)
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher:
+    """Portable fallback: compares ``(mtime, size)`` of every file matched
+    by ``list_files`` every ``interval`` seconds. ``wait`` calls between
+    scans sleep out their timeout and report no changes."""
+
+    def __init__(self, root, list_files, interval=1.0):
+        self.root = root
+        self.list_files = list_files
+        self.interval = interval
+        self._seen = self._stat_all()
+        self._scanned = time.monotonic()
+
+    def _stat_all(self):
+        seen = {}
+        for path in self.list_files():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            seen[path] = (st.st_mtime_ns, st.st_size)
+        return seen
+
+    def wait(self, timeout):
+        due = self._scanned + self.interval - time.monotonic()
+        if due > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(due, 0))
+        current = self._stat_all()
+        self._scanned = time.monotonic()
+        changed = {p for p, stamp in current.items() if self._seen.get(p) != stamp}
+        changed.update(p for p in self._seen if p not in current)
+        self._seen = current
+        return changed
+
+    def close(self):
+        pass
+
+
+def open_watcher(root, ignore_dirs, list_files, poll=False, interval=1.0):
+    """An InotifyWatcher, or a PollingWatcher when ``poll`` is set or
+    inotify cannot be used."""
+    if not poll:
+        try:
+            return InotifyWatcher(root, ignore_dirs)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}); polling every {interval}s")
+    return PollingWatcher(root, list_files, interval)
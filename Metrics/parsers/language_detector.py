@@ -1,5 +1,3 @@
-import os
-
 # Simple detector based on file extensions found in the project directory.
 EXTENSION_LANGUAGE_MAP = {
     '.py': 'python',
@@ -16,17 +14,20 @@ EXTENSION_LANGUAGE_MAP = {
 }
 
 
-def detect_language(project_dir):
+def _language_counts(project_dir, ignore_dirs=None, index=None):
+    if index is None:
+        # Imported lazily: project_index itself depends on EXTENSION_LANGUAGE_MAP
+        from Metrics.parsers.project_index import ProjectIndex
+        index = ProjectIndex.build(project_dir, ignore_dirs)
+    return index.language_counts()
+
+
+def detect_language(project_dir, ignore_dirs=None, index=None):
     """Scan the project directory for common source file extensions and
     return a language string. If multiple languages are found this returns
-    the language with the most matches. If none found, returns 'unknown'."""
-    counts = {}
-    for root, dirs, files in os.walk(project_dir):
-        for f in files:
-            _, ext = os.path.splitext(f.lower())
-            lang = EXTENSION_LANGUAGE_MAP.get(ext)
-            if lang:
-                counts[lang] = counts.get(lang, 0) + 1
+    the language with the most matches. If none found, returns 'unknown'.
+    Pass a prebuilt ``index`` to avoid walking the tree again."""
+    counts = _language_counts(project_dir, ignore_dirs, index)
 
     if not counts:
         return 'unknown'
@@ -34,16 +35,11 @@ def detect_language(project_dir):
     return max(counts.items(), key=lambda x: x[1])[0]
 
 
-def detect_languages(project_dir):
+def detect_languages(project_dir, ignore_dirs=None, index=None):
     """Return a list of detected languages sorted by descending file count.
-    If none found, returns an empty list."""
-    counts = {}
-    for root, dirs, files in os.walk(project_dir):
-        for f in files:
-            _, ext = os.path.splitext(f.lower())
-            lang = EXTENSION_LANGUAGE_MAP.get(ext)
-            if lang:
-                counts[lang] = counts.get(lang, 0) + 1
+    If none found, returns an empty list. Pass a prebuilt ``index`` to avoid
+    walking the tree again."""
+    counts = _language_counts(project_dir, ignore_dirs, index)
 
     if not counts:
         return []
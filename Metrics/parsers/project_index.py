@@ -0,0 +1,108 @@
+import os
+import fnmatch
+from collections import namedtuple
+
+from Metrics.parsers.language_detector import EXTENSION_LANGUAGE_MAP
+
+# One record per indexed source file.
+IndexedFile = namedtuple("IndexedFile", ["path", "size", "mtime", "language"])
+
+
+def _matches(relpath, patterns):
+    return any(fnmatch.fnmatch(relpath, p) for p in patterns)
+
+
+class ProjectIndex:
+    """Source files of a project, collected with a single directory walk.
+
+    The index is built once per run and handed to the language detector, the
+    parsers and the metric functions so none of them has to walk the tree
+    again. Files are kept in walk order (entries sorted by name, files of a
+    directory before its subdirectories) so results are deterministic.
+    """
+
+    def __init__(self, root, files):
+        self.root = root
+        self._files = files
+
+    @classmethod
+    def build(cls, project_dir, ignore_dirs=None, include=None, exclude=None):
+        """Walk ``project_dir`` once with ``os.scandir``.
+
+        ``ignore_dirs`` are folder/file names skipped wherever they appear.
+        ``include``/``exclude`` are optional glob patterns matched against the
+        path relative to ``project_dir`` (using ``/`` separators).
+        """
+        ignore_dirs = set(ignore_dirs or ())
+        include = list(include or ())
+        exclude = list(exclude or ())
+
+        files = []
+        stack = [project_dir]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError:
+                continue
+
+            subdirs = []
+            for entry in entries:
+                if entry.name in ignore_dirs:
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+
+                language = EXTENSION_LANGUAGE_MAP.get(os.path.splitext(entry.name)[1].lower())
+                if not language:
+                    continue
+
+                relpath = os.path.relpath(entry.path, project_dir).replace(os.sep, "/")
+                if include and not _matches(relpath, include):
+                    continue
+                if exclude and _matches(relpath, exclude):
+                    continue
+
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                files.append(IndexedFile(entry.path, st.st_size, st.st_mtime, language))
+
+            # Visit subdirectories in name order, depth first
+            stack.extend(reversed(subdirs))
+
+        return cls(project_dir, files)
+
+    def __len__(self):
+        return len(self._files)
+
+    def __iter__(self):
+        return iter(self._files)
+
+    def files(self, language=None):
+        if language is None:
+            return list(self._files)
+        return [f for f in self._files if f.language == language]
+
+    def paths(self, file_extensions=None):
+        """Return indexed paths, optionally limited to ``file_extensions``."""
+        if file_extensions is None:
+            return [f.path for f in self._files]
+        if isinstance(file_extensions, str):
+            file_extensions = (file_extensions,)
+        file_extensions = tuple(file_extensions)
+        return [f.path for f in self._files if f.path.endswith(file_extensions)]
+
+    def language_counts(self):
+        counts = {}
+        for f in self._files:
+            counts[f.language] = counts.get(f.language, 0) + 1
+        return counts
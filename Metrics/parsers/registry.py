@@ -0,0 +1,135 @@
+import os
+import importlib
+from collections import namedtuple
+
+from Metrics.parsers.language_detector import EXTENSION_LANGUAGE_MAP
+
+_engine = importlib.import_module("analysis_engine")
+_live_variables = importlib.import_module("live_variables")
+
+# One analysis backend per language. Extensions come from
+# EXTENSION_LANGUAGE_MAP, so every extension belongs to exactly one backend.
+LanguageBackend = namedtuple("LanguageBackend", ["name", "label", "extensions"])
+
+LABELS = {
+    "javascript": "JavaScript",
+    "typescript": "TypeScript",
+    "python": "Python",
+    "java": "Java",
+    "cpp": "C/C++",
+}
+
+
+def _extensions(language):
+    return tuple(ext for ext, lang in EXTENSION_LANGUAGE_MAP.items() if lang == language)
+
+
+BACKENDS = {lang: LanguageBackend(lang, LABELS.get(lang, lang), _extensions(lang))
+            for lang in dict.fromkeys(EXTENSION_LANGUAGE_MAP.values())}
+
+
+def get_backend(language):
+    backend = BACKENDS.get(language)
+    if backend is None:
+        raise KeyError(f"No analysis backend for language '{language}'")
+    return backend
+
+
+def report_paths(output_dir):
+    """Report files of one language inside ``output_dir``."""
+    return {
+        "halstead": os.path.join(output_dir, "halstead_report.csv"),
+        "information_flow": os.path.join(output_dir, "information_flow_metrics.csv"),
+        "live_variables": os.path.join(output_dir, "live_variable_metrics.csv"),
+        "function_flow": os.path.join(output_dir, "function_flow_metrics.csv"),
+        "call_graph": os.path.join(output_dir, "call_graph.json"),
+    }
+
+
+def open_report_set(output_dir, live_format="lines", prefilter="skip", report_format="csv", compression=None,
+                    combined=None, timings=None, approximate=False):
+    """A ReportSet writing a language's reports into ``output_dir``, plus
+    the path of its call graph."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = report_paths(output_dir)
+    report_set = _engine.ReportSet(paths["halstead"], paths["information_flow"], paths["live_variables"],
+                                   live_format, paths["function_flow"], paths["call_graph"], prefilter,
+                                   report_format, compression, combined, timings, approximate)
+    return report_set, paths["call_graph"]
+
+
+def language_results(details, call_graph_path):
+    """The per-language entry of run_quality_metrics' results."""
+    reports = details["reports"]
+    results = {
+        'halstead': reports['halstead'],
+        'information_flow': reports['information_flow'],
+        'function_flow': reports['function_flow'],
+        'call_graph': call_graph_path,
+        'live_variables': reports['live_variables'],
+        'total_ops': details['total_ops'],
+        'total_opnds': details['total_opnds'],
+        'live_variables_summary': details['live_variables_summary'],
+        'prefilter_summary': details['prefilter_summary']
+    }
+    if 'halstead_estimate' in details:
+        results['halstead_estimate'] = details['halstead_estimate']
+    return results
+
+
+def language_paths(language, project_dir, ignore_dirs, index=None):
+    """Files of ``language``: the index entries tagged with it, or a walk
+    for its extensions."""
+    if index is not None:
+        return [f.path for f in index.files(language)]
+    return _live_variables.get_files_by_extensions(project_dir, ignore_dirs, get_backend(language).extensions)
+
+
+def run_languages(project_dir, ignore_dirs, output_dir, languages, index=None, jobs=1, cache_path=None,
+                  live_format="lines", cancel_event=None, progress=None, prefilter="skip",
+                  report_format="csv", compression=None, combined=None, timings=None, approximate=False,
+                  analyzed=None):
+    """Analyze every language in ``languages`` with one scheduling pass.
+
+    Each file is read and analyzed once, by the backend its extension maps
+    to, and the files of all languages share one worker pool. Reports of a
+    language go to ``output_dir/<language>``. Returns ``{language: results}``
+    where a language whose reports failed has ``{"error": message}``.
+    Files in ``analyzed`` reuse the analyze_source result it maps them to.
+    """
+    groups = []
+    call_graphs = {}
+    for language in languages:
+        backend = get_backend(language)
+        report_set, call_graphs[language] = open_report_set(os.path.join(output_dir, language), live_format,
+                                                            prefilter, report_format, compression,
+                                                            combined, timings, approximate)
+        paths = language_paths(language, project_dir, ignore_dirs, index)
+        print(f"Running metrics ({backend.label}): {len(paths)} files")
+        groups.append((language, report_set, paths))
+
+    _engine.analyze_files([(report_set, paths) for _, report_set, paths in groups], index, jobs,
+                          cache_path, prefilter, cancel_event, progress, timings, analyzed)
+
+    results = {}
+    for language, report_set, _ in groups:
+        try:
+            results[language] = language_results(report_set.finish(progress), call_graphs[language])
+        except Exception as e:
+            print(f"Error writing reports for {language}: {e}")
+            results[language] = {"error": str(e)}
+    return results
+
+
+def run_language(language, project_dir, ignore_dirs, output_dir, index=None, jobs=1, cache_path=None,
+                 live_format="lines", cancel_event=None, progress=None, prefilter="skip",
+                 report_format="csv", compression=None, combined=None, timings=None, approximate=False):
+    """Analyze a single language, writing its reports into ``output_dir``."""
+    backend = get_backend(language)
+    report_set, call_graph_path = open_report_set(output_dir, live_format, prefilter, report_format,
+                                                  compression, combined, timings, approximate)
+    paths = language_paths(language, project_dir, ignore_dirs, index)
+    print(f"Running metrics ({backend.label})...")
+    _engine.analyze_files([(report_set, paths)], index, jobs, cache_path, prefilter,
+                          cancel_event, progress, timings)
+    return language_results(report_set.finish(progress), call_graph_path)
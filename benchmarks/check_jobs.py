@@ -0,0 +1,72 @@
+"""Check that the reports do not depend on the worker count.
+
+Generates a synthetic corpus (see generate_corpus), runs quality_metrics
+on it with ``-j 1`` and with ``-j N`` and compares every report byte for
+byte. The exit status is 1 if any file differs or exists in one run only.
+
+    python benchmarks/check_jobs.py --files 100 --jobs 4
+"""
+import os
+import sys
+import filecmp
+import argparse
+import tempfile
+import contextlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+import generate_corpus
+import quality_metrics
+
+
+def report_files(output_dir):
+    files = set()
+    for root, _, names in os.walk(output_dir):
+        files.update(os.path.relpath(os.path.join(root, name), output_dir) for name in names)
+    return files
+
+
+def compare_runs(corpus, work_dir, jobs):
+    """Paths of the reports that differ between ``-j 1`` and ``-j jobs``."""
+    outputs = []
+    for j in (1, jobs):
+        output_dir = os.path.join(work_dir, f"j{j}")
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            quality_metrics.run_quality_metrics(corpus, {"node_modules"}, output_dir, jobs=j)
+        outputs.append(output_dir)
+
+    single, parallel = (report_files(d) for d in outputs)
+    differ = sorted(single ^ parallel)
+    for name in sorted(single & parallel):
+        if not filecmp.cmp(os.path.join(outputs[0], name), os.path.join(outputs[1], name), shallow=False):
+            differ.append(name)
+    return differ
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare reports of a single and a parallel run.")
+    parser.add_argument("--files", type=int, default=100, help="Files per language")
+    parser.add_argument("--lines", type=int, default=80, help="Average lines per file")
+    parser.add_argument("--jobs", type=int, default=4, help="Worker count to compare with -j 1")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="qualitas-jobs-") as work_dir:
+        corpus = os.path.join(work_dir, "corpus")
+        generate_corpus.generate(corpus, args.files, args.lines, seed=args.seed)
+        differ = compare_runs(corpus, work_dir, args.jobs)
+
+    if differ:
+        print(f"Reports differ between -j 1 and -j {args.jobs}:")
+        for name in differ:
+            print(f"  {name}")
+        return 1
+    print(f"Reports of -j 1 and -j {args.jobs} are identical")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""Deterministic synthetic source trees for the benchmarks.
+
+The same seed, counts and sizes always give byte-identical files, so runs
+on different machines or commits measure the same input. Each language
+gets ``files`` files of roughly ``lines`` lines (spread between half and
+one and a half times that), made of functions that declare variables,
+loop, branch, call each other across files and carry comments and
+strings, so every lexer and collector path is exercised.
+
+    python benchmarks/generate_corpus.py /tmp/corpus --files 200 --lines 300
+"""
+import os
+import random
+import argparse
+
+LANGUAGES = ("javascript", "typescript", "python", "java", "cpp")
+EXTENSIONS = {"javascript": ".js", "typescript": ".ts", "python": ".py", "java": ".java", "cpp": ".cpp"}
+
+_WORDS = ("value", "count", "item", "total", "index", "result", "buffer", "node", "key", "offset",
+          "limit", "state", "entry", "score", "delta", "cache", "token", "width", "depth", "name")
+
+
+def _ident(rng):
+    return rng.choice(_WORDS) + rng.choice(("", "A", "B", "Max", "Min", "Next", "Tmp")) + str(rng.randrange(10))
+
+
+def _c_like_body(rng, callees, declare, indent, comment="//"):
+    """Statement lines shared by the brace languages."""
+    names = [_ident(rng) for _ in range(rng.randint(2, 5))]
+    lines = [f"{indent}{comment} {rng.choice(_WORDS)} {rng.choice(_WORDS)} handling"]
+    for name in names:
+        lines.append(f"{indent}{declare} {name} = {rng.randrange(100)} + {rng.randrange(100)} * 2;")
+    a, b = names[0], names[-1]
+    lines.append(f"{indent}for ({declare} i = 0; i < {b}; i++) {{")
+    lines.append(f"{indent}    if ({a} % 3 == 0 && i != {rng.randrange(50)}) {{")
+    lines.append(f"{indent}        {a} += {rng.choice(callees)}(i, \"{rng.choice(_WORDS)}\");")
+    lines.append(f"{indent}    }} else {{")
+    lines.append(f"{indent}        {a} -= {b} / (i + 1);")
+    lines.append(f"{indent}    }}")
+    lines.append(f"{indent}}}")
+    lines.append(f"{indent}while ({b} > {rng.randrange(10)}) {{ {b} = {b} - 1; }}")
+    return lines, a
+
+
+def _js_function(rng, name, callees, typed):
+    arg = ": number" if typed else ""
+    ret = ": number" if typed else ""
+    body, result = _c_like_body(rng, callees, "let", "    ")
+    head = f"function {name}(a{arg}, b{arg}){ret} {{" if rng.random() < 0.7 else \
+        f"const {name} = (a{arg}, b{arg}){ret} => {{"
+    return [head] + body + [f"    return {result} + `${{a}}-${{b}}`.length;", "}" + (";" if "=>" in head else ""), ""]
+
+
+def _java_function(rng, name, callees):
+    body, result = _c_like_body(rng, callees, "int", "        ")
+    return [f"    public static int {name}(int a, String b) {{"] + body + \
+        [f"        return {result};", "    }", ""]
+
+
+def _cpp_function(rng, name, callees):
+    body, result = _c_like_body(rng, callees, "int", "    ")
+    return [f"int {name}(int a, const char* b) {{"] + body + \
+        [f"    /* {rng.choice(_WORDS)} */ return {result};", "}", ""]
+
+
+def _python_function(rng, name, callees):
+    names = [_ident(rng) for _ in range(rng.randint(2, 5))]
+    lines = [f"def {name}(a, b):", f'    """{rng.choice(_WORDS).title()} the {rng.choice(_WORDS)}."""']
+    for var in names:
+        lines.append(f"    {var} = {rng.randrange(100)} + {rng.randrange(100)} * 2  # {rng.choice(_WORDS)}")
+    first, last = names[0], names[-1]
+    lines += [
+        f"    for i in range({last}):",
+        f"        if {first} % 3 == 0 and i != {rng.randrange(50)}:",
+        f"            {first} += {rng.choice(callees)}(i, '{rng.choice(_WORDS)}')",
+        "        else:",
+        f"            {first} -= {last} // (i + 1)",
+        f"    while {last} > {rng.randrange(10)}:",
+        f"        {last} = {last} - 1",
+        f"    return {first}",
+        "",
+    ]
+    return lines
+
+
+def _wrap(language, file_no, functions):
+    if language == "java":
+        return [f"public class Module{file_no} {{", ""] + functions + ["}"]
+    if language == "cpp":
+        return ["#include <string>", ""] + functions
+    return functions
+
+
+def source_file(language, file_no, lines, rng, function_names):
+    """Text of one file of about ``lines`` lines. Calls go to functions of
+    this file and of other files, through ``function_names``."""
+    out = []
+    own = []
+    while len(out) < lines:
+        name = f"fn{file_no}_{len(own)}"
+        callees = own[-3:] + [rng.choice(function_names) for _ in range(2)] if function_names else [name]
+        if language == "python":
+            out += _python_function(rng, name, callees)
+        elif language == "java":
+            out += _java_function(rng, name, callees)
+        elif language == "cpp":
+            out += _cpp_function(rng, name, callees)
+        else:
+            out += _js_function(rng, name, callees, typed=language == "typescript")
+        own.append(name)
+    return "\n".join(_wrap(language, file_no, out)) + "\n", own
+
+
+def generate(output_dir, files=50, lines=200, languages=LANGUAGES, seed=0):
+    """Write the corpus under ``output_dir/<language>/``; returns the number
+    of files and bytes written."""
+    total_files = total_bytes = 0
+    for language in languages:
+        rng = random.Random(f"{seed}:{language}")
+        lang_dir = os.path.join(output_dir, language)
+        os.makedirs(lang_dir, exist_ok=True)
+        function_names = []
+        for file_no in range(files):
+            size = max(1, int(lines * rng.uniform(0.5, 1.5)))
+            text, defined = source_file(language, file_no, size, rng, function_names)
+            function_names += defined
+            path = os.path.join(lang_dir, f"module_{file_no}{EXTENSIONS[language]}")
+            with open(path, "w", encoding="utf-8", newline="\n") as f:
+                f.write(text)
+            total_files += 1
+            total_bytes += len(text.encode("utf-8"))
+    return total_files, total_bytes
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic source tree for benchmarking.")
+    parser.add_argument("output_dir", help="Directory to write the corpus into")
+    parser.add_argument("--files", type=int, default=50, help="Files per language")
+    parser.add_argument("--lines", type=int, default=200, help="Average lines per file")
+    parser.add_argument("--languages", default=",".join(LANGUAGES),
+                        help="Comma-separated subset of: " + ", ".join(LANGUAGES))
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    count, size = generate(args.output_dir, args.files, args.lines,
+                           [lang.strip() for lang in args.languages.split(",")], args.seed)
+    print(f"Wrote {count} files ({size / 1e6:.2f} MB) to {args.output_dir}")
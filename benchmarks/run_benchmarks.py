@@ -0,0 +1,226 @@
+"""Throughput benchmarks for the metric collectors.
+
+Generates a synthetic corpus (see generate_corpus), runs each target in a
+fresh interpreter and records wall time, files/sec, MB/sec, the elapsed
+time of every progress phase and peak RSS. Results are written as JSON;
+with ``--baseline`` they are compared against an earlier results file
+and the exit status is 1 if any target got slower or bigger than the
+tolerances allow.
+
+    python benchmarks/run_benchmarks.py --files 100 --output bench.json
+    python benchmarks/run_benchmarks.py --files 100 --baseline bench.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import generate_corpus
+
+TARGETS = ("halstead", "information_flow", "live_variables", "quality_metrics")
+EXTENSIONS = tuple(sorted(set(generate_corpus.EXTENSIONS.values())))
+# Lower is better for these; the throughput figures are higher-is-better
+_COST_KEYS = ("wall_sec", "peak_rss_mb")
+_SPEED_KEYS = ("files_per_sec", "mb_per_sec")
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _run_target(target, corpus, output_dir, jobs):
+    """Run one target in this process; returns its phase times."""
+    import quality_metrics
+    from progress import ProgressBus
+    from halstead import run_halstead_analysis
+    from information_flow import run_information_flow_analysis
+    from live_variables import run_live_variable_analysis
+
+    phases = {}
+
+    def collect(event):
+        if event["type"] == "phase_end":
+            phases[event["phase"]] = round(phases.get(event["phase"], 0) + event["elapsed_sec"], 3)
+
+    bus = ProgressBus(collect)
+    ignore = {"node_modules"}
+    if target == "halstead":
+        run_halstead_analysis(corpus, ignore, os.path.join(output_dir, "halstead.csv"), EXTENSIONS,
+                              jobs=jobs, progress=bus)
+    elif target == "information_flow":
+        run_information_flow_analysis(corpus, ignore, os.path.join(output_dir, "information_flow.csv"),
+                                      EXTENSIONS, jobs=jobs, progress=bus)
+    elif target == "live_variables":
+        run_live_variable_analysis(corpus, ignore, os.path.join(output_dir, "live_variables.csv"),
+                                   EXTENSIONS, jobs=jobs, progress=bus)
+    else:
+        quality_metrics.run_quality_metrics(corpus, ignore, output_dir, jobs=jobs, progress=bus)
+    return phases
+
+
+def worker(target, corpus, output_dir, jobs, result_path):
+    """Entry point of the child process: time one target and write its
+    measurements to ``result_path``. Imports happen before the clock
+    starts."""
+    sys.path.insert(0, ROOT_DIR)
+    import quality_metrics  # noqa: F401  (also puts Metrics/PY on sys.path)
+    start = time.perf_counter()
+    phases = _run_target(target, corpus, output_dir, jobs)
+    wall = time.perf_counter() - start
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump({"wall_sec": round(wall, 3), "phases": phases, "peak_rss_mb": _peak_rss_mb()}, f)
+
+
+def corpus_size(corpus):
+    files = size = 0
+    for root, _, names in os.walk(corpus):
+        for name in names:
+            if name.endswith(EXTENSIONS):
+                files += 1
+                size += os.path.getsize(os.path.join(root, name))
+    return files, size
+
+
+def measure(target, corpus, jobs, repeat, files, size):
+    """Best of ``repeat`` runs of ``target``, each in a new interpreter so
+    peak RSS and import costs belong to that target alone."""
+    runs = []
+    for _ in range(repeat):
+        scratch = tempfile.mkdtemp(prefix="qualitas-bench-")
+        result_path = os.path.join(scratch, "result.json")
+        try:
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", target,
+                            "--corpus", corpus, "--jobs", str(jobs), "--result", result_path,
+                            "--scratch", scratch],
+                           check=True, stdout=subprocess.DEVNULL)
+            with open(result_path, encoding="utf-8") as f:
+                runs.append(json.load(f))
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    best = min(runs, key=lambda run: run["wall_sec"])
+    peaks = [run["peak_rss_mb"] for run in runs if run["peak_rss_mb"] is not None]
+    best["peak_rss_mb"] = max(peaks, default=None)
+    wall = best["wall_sec"] or 1e-9
+    best["files_per_sec"] = round(files / wall, 1)
+    best["mb_per_sec"] = round(size / 1e6 / wall, 3)
+    return best
+
+
+def compare(results, baseline, tolerance, rss_tolerance):
+    """Regressions of ``results`` against ``baseline`` as readable lines.
+    Speeds may drop by ``tolerance`` and peak RSS may grow by
+    ``rss_tolerance`` (both fractions) before they count."""
+    regressions = []
+    for target, current in results["results"].items():
+        before = baseline.get("results", {}).get(target)
+        if before is None:
+            continue
+        for key in _SPEED_KEYS:
+            if before.get(key) and current[key] < before[key] * (1 - tolerance):
+                regressions.append(f"{target}: {key} {current[key]} < baseline {before[key]}")
+        for key in _COST_KEYS:
+            limit = rss_tolerance if key == "peak_rss_mb" else tolerance
+            if before.get(key) and current.get(key) and current[key] > before[key] * (1 + limit):
+                regressions.append(f"{target}: {key} {current[key]} > baseline {before[key]}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Qualitas metric collectors.")
+    parser.add_argument("--corpus", help="Existing source tree to use instead of generating one")
+    parser.add_argument("--files", type=int, default=50, help="Generated files per language")
+    parser.add_argument("--lines", type=int, default=200, help="Average lines per generated file")
+    parser.add_argument("--languages", default=",".join(generate_corpus.LANGUAGES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--targets", default=",".join(TARGETS),
+                        help="Comma-separated subset of: " + ", ".join(TARGETS))
+    parser.add_argument("-j", "--jobs", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per target; the fastest is kept")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="Results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed relative slowdown before a target counts as regressed")
+    parser.add_argument("--rss-tolerance", type=float, default=0.25,
+                        help="Allowed relative growth of peak RSS")
+    # Internal: run a single target in this process
+    parser.add_argument("--worker", choices=TARGETS, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    parser.add_argument("--scratch", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.worker:
+        worker(args.worker, args.corpus, args.scratch, args.jobs, args.result)
+        return 0
+
+    corpus, generated = args.corpus, None
+    if corpus is None:
+        generated = corpus = tempfile.mkdtemp(prefix="qualitas-corpus-")
+        generate_corpus.generate(corpus, args.files, args.lines,
+                                 [lang.strip() for lang in args.languages.split(",")], args.seed)
+    try:
+        files, size = corpus_size(corpus)
+        results = {
+            "meta": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "jobs": args.jobs,
+                "repeat": args.repeat,
+                "corpus": args.corpus or {"files": args.files, "lines": args.lines,
+                                          "languages": args.languages, "seed": args.seed},
+                "corpus_files": files,
+                "corpus_bytes": size,
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "results": {},
+        }
+        for target in (t.strip() for t in args.targets.split(",")):
+            result = measure(target, corpus, args.jobs, args.repeat, files, size)
+            results["results"][target] = result
+            print(f"{target:17} {result['wall_sec']:8.3f}s {result['files_per_sec']:9.1f} files/s "
+                  f"{result['mb_per_sec']:7.3f} MB/s  peak {result['peak_rss_mb']} MB", file=sys.stderr)
+    finally:
+        if generated:
+            shutil.rmtree(generated, ignore_errors=True)
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.rss_tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("No regressions against baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,384 @@
+"""Long-lived metrics daemon for editors and pre-commit hooks.
+
+Analyzes the project once, keeps the file index, the per-file results and
+one call graph per language in memory, then watches the tree (inotify, or
+polling where that is unavailable) and re-analyzes only the files that
+changed. Project aggregates (Halstead totals, fan-in/fan-out, live
+variable summaries) are updated from the per-file deltas. A local HTTP
+endpoint serves the current state:
+
+    GET /metrics              project and per-language summary
+    GET /file?path=<path>     metrics of one file
+    GET /health               generation counter and pending changes
+
+    python metrics_daemon.py path/to/project --ignore node_modules,dist --port 8765
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import Counter
+from functools import partial
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(CURRENT_DIR, "Metrics", "PY"))
+
+import halstead
+import information_flow
+import source_filter
+from analysis_engine import analyze_source
+from call_graph import CallGraph
+from parallel import map_files
+from watcher import open_watcher, RESCAN
+from importlib import import_module
+
+language_detector = import_module("Metrics.parsers.language_detector")
+project_index = import_module("Metrics.parsers.project_index")
+
+# Changes arriving within this many seconds are analyzed together
+DEBOUNCE_SEC = 0.05
+# Most complex files listed per language in /metrics
+TOP_FILES = 10
+# Refreshes touching fewer files than this skip the process pool
+SMALL_REFRESH = 32
+
+
+class _LanguageState:
+    """In-memory aggregates of one language, kept up to date per file."""
+
+    def __init__(self):
+        self.files = {}
+        self.graph = CallGraph()
+        self.total_ops, self.total_opnds = Counter(), Counter()
+        self.loc = 0
+
+    def remove(self, path):
+        old = self.files.pop(path, None)
+        if old is None:
+            return
+        self.total_ops -= old["ops"]
+        self.total_opnds -= old["opnds"]
+        self.loc -= old["loc"]
+        self.graph.remove_file(path)
+
+    def add(self, path, result):
+        self.remove(path)
+        var_map = result["variables"]
+        # Only what the aggregates need is kept; the per-line variables are
+        # reduced to their summary
+        self.files[path] = {
+            "ops": Counter(result["ops"]),
+            "opnds": Counter(result["opnds"]),
+            "loc": result["loc"],
+            "length": result["length"],
+            "live_lines": len(var_map),
+            "max_live": max((len(v) for v in var_map.values()), default=0),
+            "sampled": result["sampled"],
+        }
+        self.total_ops.update(result["ops"])
+        self.total_opnds.update(result["opnds"])
+        self.loc += result["loc"]
+        self.graph.update_file(path, result["functions"], result["function_calls"], result["digest"])
+
+    def summary(self):
+        files = self.files
+        halstead_total = halstead.halstead_from_counters(self.total_ops, self.total_opnds)
+        lengths = {path: entry["length"] for path, entry in files.items()}
+        flow = sorted(information_flow.file_flow_rows(self.graph, lengths), key=lambda r: r[-1], reverse=True)
+        return {
+            "files": len(files),
+            "loc": self.loc,
+            "halstead": halstead_total,
+            "live_variables_summary": {
+                "files": len(files),
+                "lines": sum(e["live_lines"] for e in files.values()),
+                "max_live": max((e["max_live"] for e in files.values()), default=0),
+            },
+            "most_complex": [dict(zip(("File", "Length", "FanIn", "FanOut", "Complexity"), row))
+                             for row in flow[:TOP_FILES]],
+        }
+
+
+class ProjectState:
+    """Per-file results and per-language aggregates of one project."""
+
+    def __init__(self, root, ignore_dirs, jobs=1, cache_path=None, prefilter="skip"):
+        self.root = os.path.abspath(root)
+        self.ignore_dirs = set(ignore_dirs or ())
+        self.jobs = jobs
+        self.cache_path = cache_path
+        self.prefilter = prefilter
+        self.languages = {}
+        self.language_of = {}
+        self.skipped = Counter()
+        self.skipped_paths = {}
+        self.generation = 0
+        self.updated = None
+        self._summary = None
+        self._lock = threading.RLock()
+
+    # Files
+
+    def _language(self, path):
+        language = language_detector.EXTENSION_LANGUAGE_MAP.get(os.path.splitext(path)[1].lower())
+        if language is None:
+            return None
+        rel = os.path.relpath(path, self.root)
+        if rel.startswith(os.pardir) or any(part in self.ignore_dirs for part in rel.split(os.sep)):
+            return None
+        return language
+
+    def list_files(self):
+        return [f.path for f in project_index.ProjectIndex.build(self.root, self.ignore_dirs)]
+
+    def _analyze(self, paths, jobs):
+        analyze = partial(analyze_source, cache_path=self.cache_path, prefilter=self.prefilter)
+        sizes = source_filter.file_sizes(paths) if jobs != 1 else None
+        return map_files(analyze, paths, jobs, weights=sizes)
+
+    def _drop(self, path):
+        language = self.language_of.pop(path, None)
+        if language is not None:
+            self.languages[language].remove(path)
+        kind = self.skipped_paths.pop(path, None)
+        if kind is not None:
+            self.skipped[kind] -= 1
+
+    def _store(self, path, result):
+        self._drop(path)
+        if result.get("skipped"):
+            self.skipped_paths[path] = result["skipped"]
+            self.skipped[result["skipped"]] += 1
+            return
+        language = self._language(path)
+        self.language_of[path] = language
+        self.languages.setdefault(language, _LanguageState()).add(path, result)
+
+    # Updates
+
+    def scan(self):
+        """Analyze the whole project, replacing everything known."""
+        with self._lock:
+            for path in list(self.language_of) + list(self.skipped_paths):
+                self._drop(path)
+            for path, result in self._analyze(self.list_files(), self.jobs):
+                self._store(path, result)
+            self._changed()
+
+    def refresh(self, changed):
+        """Re-analyze the files behind ``changed`` paths. A directory stands
+        for every file below it; missing paths are removed. RESCAN rescans
+        the whole project. Returns the number of files updated."""
+        if changed is RESCAN:
+            self.scan()
+            return len(self.language_of)
+
+        with self._lock:
+            known = set(self.language_of) | set(self.skipped_paths)
+            to_analyze, to_remove = set(), set()
+            for path in changed:
+                path = os.path.abspath(path)
+                if os.path.isdir(path):
+                    prefix = path + os.sep
+                    to_remove.update(p for p in known if p.startswith(prefix))
+                    to_analyze.update(f.path for f in project_index.ProjectIndex.build(path, self.ignore_dirs)
+                                      if self._language(f.path))
+                elif os.path.isfile(path):
+                    if self._language(path):
+                        to_analyze.add(path)
+                else:
+                    prefix = path + os.sep
+                    to_remove.update(p for p in known if p == path or p.startswith(prefix))
+            to_remove -= to_analyze
+
+            for path in to_remove:
+                self._drop(path)
+            # A handful of edited files is faster to analyze in-process
+            jobs = self.jobs if len(to_analyze) >= SMALL_REFRESH else 1
+            for path, result in self._analyze(sorted(to_analyze), jobs):
+                self._store(path, result)
+            if to_analyze or to_remove:
+                self._changed()
+            return len(to_analyze) + len(to_remove)
+
+    def _changed(self):
+        self.generation += 1
+        self.updated = time.time()
+        self._summary = None
+
+    # Queries
+
+    def summary(self):
+        """Project metrics; computed once per generation, then served from
+        memory."""
+        with self._lock:
+            if self._summary is None:
+                languages = {lang: state.summary() for lang, state in sorted(self.languages.items())}
+                total_ops, total_opnds = Counter(), Counter()
+                for state in self.languages.values():
+                    total_ops.update(state.total_ops)
+                    total_opnds.update(state.total_opnds)
+                self._summary = {
+                    "project_dir": self.root,
+                    "generation": self.generation,
+                    "updated": self.updated,
+                    "files": sum(s["files"] for s in languages.values()),
+                    "loc": sum(s["loc"] for s in languages.values()),
+                    "halstead": halstead.halstead_from_counters(total_ops, total_opnds),
+                    "languages": languages,
+                    "prefilter_summary": {"policy": self.prefilter, "skipped": +self.skipped},
+                }
+            return self._summary
+
+    def file_metrics(self, path):
+        path = os.path.abspath(os.path.join(self.root, path))
+        with self._lock:
+            language = self.language_of.get(path)
+            if language is None:
+                return None
+            state = self.languages[language]
+            entry = state.files[path]
+            row = information_flow.file_flow_rows(state.graph, {path: entry["length"]})[0]
+            metrics = halstead.halstead_from_counters(entry["ops"], entry["opnds"]) or {}
+            return {
+                "file": path,
+                "language": language,
+                "generation": self.generation,
+                "loc": entry["loc"],
+                "halstead": metrics,
+                "information_flow": dict(zip(("Length", "FanIn", "FanOut", "Complexity"), row[1:])),
+                "live_variables": {"lines": entry["live_lines"], "max_live": entry["max_live"]},
+                "sampled": entry["sampled"],
+            }
+
+
+class MetricsDaemon:
+    """Watches a project and keeps a ProjectState current on a background
+    thread."""
+
+    def __init__(self, state, poll=False, interval=1.0):
+        self.state = state
+        self.poll = poll
+        self.interval = interval
+        self.pending = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._watcher = None
+
+    def start(self):
+        started = time.perf_counter()
+        self.state.scan()
+        print(f"Indexed {self.state.summary()['files']} files in {time.perf_counter() - started:.2f}s")
+        self._watcher = open_watcher(self.state.root, self.state.ignore_dirs, self.state.list_files,
+                                     self.poll, self.interval)
+        self._thread = threading.Thread(target=self._loop, name="qualitas-watch", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            changed = self._watcher.wait(0.5)
+            if changed is not RESCAN and not changed:
+                continue
+            # Editors write files in several steps; gather them into one update
+            while changed is not RESCAN:
+                more = self._watcher.wait(DEBOUNCE_SEC)
+                if more is RESCAN:
+                    changed = RESCAN
+                elif not more:
+                    break
+                else:
+                    changed |= more
+            self.pending = 1 if changed is RESCAN else len(changed)
+            started = time.perf_counter()
+            try:
+                count = self.state.refresh(changed)
+            except Exception as e:
+                print(f"Refresh failed: {e}")
+                continue
+            finally:
+                self.pending = 0
+            if count:
+                print(f"Updated {count} file(s) in {(time.perf_counter() - started) * 1000:.1f} ms "
+                      f"(generation {self.state.generation})")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._watcher is not None:
+            self._watcher.close()
+
+
+def _handler(daemon):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/metrics":
+                self._send(200, daemon.state.summary())
+            elif url.path == "/file":
+                path = parse_qs(url.query).get("path", [None])[0]
+                metrics = daemon.state.file_metrics(path) if path else None
+                if metrics is None:
+                    self._send(404, {"detail": "File not analyzed."})
+                else:
+                    self._send(200, metrics)
+            elif url.path == "/health":
+                self._send(200, {"status": "ok", "generation": daemon.state.generation,
+                                 "pending": daemon.pending})
+            else:
+                self._send(404, {"detail": "Not found."})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(daemon, host="127.0.0.1", port=8765):
+    server = ThreadingHTTPServer((host, port), _handler(daemon))
+    print(f"Serving metrics for {daemon.state.root} on http://{host}:{server.server_port}")
+    return server
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Keep Qualitas metrics of a project up to date.")
+    parser.add_argument("project_dir", help="Project directory to watch")
+    parser.add_argument("--ignore", default="node_modules,dist,build,.next,.git",
+                        help="Comma-separated folder/file names to ignore")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Worker processes for the initial scan (0 = one per CPU)")
+    parser.add_argument("--cache", metavar="PATH", help="SQLite file of per-file results")
+    parser.add_argument("--prefilter", choices=source_filter.POLICIES, default="skip")
+    parser.add_argument("--poll", action="store_true", help="Poll for changes instead of using inotify")
+    parser.add_argument("--interval", type=float, default=1.0, help="Polling interval in seconds")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    ignore = set(map(str.strip, args.ignore.split(","))) if args.ignore else set()
+    daemon = MetricsDaemon(ProjectState(args.project_dir, ignore, args.jobs, args.cache, args.prefilter),
+                           args.poll, args.interval)
+    daemon.start()
+    server = serve(daemon, args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.stop()
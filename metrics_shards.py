@@ -0,0 +1,138 @@
+"""Split an analysis across machines and combine the pieces.
+
+Every node builds the same project index and analyzes one shard of it;
+the shard files are then reduced into the usual reports, identical to a
+single ``quality_metrics.py`` run over the whole project:
+
+    python metrics_shards.py analyze repo --shard 0/16 -o shard-0.jsonl.gz
+    ...
+    python metrics_shards.py merge shard-0.jsonl.gz shard-1.jsonl.gz -o shard-01.jsonl.gz
+    python metrics_shards.py reduce shard-*.jsonl.gz --output-dir reports
+
+A shard file holds each file's operator/operand counts, LOC, function
+definitions, call sites and live variables keyed by its index position,
+plus per-language Counters; merging is associative, so shards can be
+combined in any grouping.
+"""
+import os
+import sys
+import argparse
+from functools import partial
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(CURRENT_DIR, "Metrics", "PY"))
+
+import shards
+import source_filter
+from analysis_engine import analyze_source
+from combined_reports import CombinedReports
+from parallel import map_files
+from quality_metrics import combine_results, project_index, registry
+
+
+def analyze_shard(project_dir, ignore_dirs, shard, count, output, include=None, exclude=None,
+                  jobs=1, cache_path=None, prefilter="skip"):
+    """Analyze shard ``shard`` of ``count`` and write it to ``output``."""
+    if not 0 <= shard < count:
+        raise ValueError(f"Shard {shard} is not in 0..{count - 1}")
+    index = project_index.ProjectIndex.build(project_dir, ignore_dirs, include, exclude)
+    header = shards.new_header(project_dir, prefilter, [(shard, count)])
+    mine = [(order, f) for order, f in enumerate(index) if shards.shard_of(order, count) == shard]
+    for order, f in mine:
+        shards.add_language_file(header, f.language, order)
+
+    paths = [f.path for _, f in mine]
+    analyze = partial(analyze_source, cache_path=cache_path, prefilter=prefilter)
+    sizes = [f.size for _, f in mine] if jobs != 1 else None
+    with shards.ShardWriter(output, header) as writer:
+        results = map_files(analyze, paths, jobs, weights=sizes)
+        for (order, f), (_, result) in zip(mine, results):
+            relpath = os.path.relpath(f.path, project_dir).replace(os.sep, "/")
+            writer.write(shards.make_record(relpath, order, f.language, result))
+    print(f"Shard {shard}/{count}: {len(paths)} of {len(index)} files written to {output}")
+    return output
+
+
+def reduce_shards(shard_paths, output_dir, project_dir=None, live_format="lines",
+                  report_format="csv", compression=None, approximate=False):
+    """Write the reports of the merged shards into ``output_dir``; returns
+    the same structure as run_quality_metrics."""
+    header = shards.merged_header(shard_paths)
+    missing = shards.missing_shards(header)
+    if missing:
+        print(f"Warning: shard(s) {', '.join(f'{k}/{n}' for k, n in missing)} missing; "
+              f"reports cover the given shards only")
+    root = project_dir or header["root"]
+    prefilter = header["prefilter"]
+    os.makedirs(output_dir, exist_ok=True)
+
+    combined_reports = CombinedReports(output_dir, live_format, report_format, compression, approximate)
+    all_results = {}
+    # One pass per language, so the combined reports list files language by
+    # language exactly like a single run
+    for language in shards.language_order(header):
+        report_set, call_graph_path = registry.open_report_set(os.path.join(output_dir, language), live_format,
+                                                               prefilter, report_format, compression,
+                                                               combined_reports, approximate=approximate)
+        report_set.open()
+        for record in shards.merged_records(shard_paths):
+            if record["language"] == language:
+                path = os.path.join(root, record["path"].replace("/", os.sep))
+                report_set.add(path, shards.record_result(record))
+        all_results[language] = registry.language_results(report_set.finish(), call_graph_path)
+
+    return combine_results(all_results, combined_reports, prefilter)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sharded Qualitas analysis.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    analyze = commands.add_parser("analyze", help="Analyze one shard of a project")
+    analyze.add_argument("project_dir")
+    analyze.add_argument("--shard", required=True, metavar="K/N", help="Shard K (0-based) of N")
+    analyze.add_argument("-o", "--output", required=True, help="Shard file to write (.jsonl.gz)")
+    analyze.add_argument("--ignore", default="", help="Comma-separated folder/file names to ignore")
+    analyze.add_argument("--include", action="append", help="Glob of project-relative paths to include")
+    analyze.add_argument("--exclude", action="append", help="Glob of project-relative paths to exclude")
+    analyze.add_argument("-j", "--jobs", type=int, default=1)
+    analyze.add_argument("--cache", metavar="PATH")
+    analyze.add_argument("--prefilter", choices=source_filter.POLICIES, default="skip")
+
+    merge = commands.add_parser("merge", help="Merge shard files into one")
+    merge.add_argument("shards", nargs="+")
+    merge.add_argument("-o", "--output", required=True)
+
+    reduce_ = commands.add_parser("reduce", help="Write the reports of a set of shards")
+    reduce_.add_argument("shards", nargs="+")
+    reduce_.add_argument("--output-dir", required=True)
+    reduce_.add_argument("--project-dir", help="Root to prefix file paths with (default: as analyzed)")
+    reduce_.add_argument("--live-format", choices=("lines", "ranges"), default="lines")
+    reduce_.add_argument("--report-format", choices=("csv", "jsonl", "parquet"), default="csv")
+    reduce_.add_argument("--compression")
+    reduce_.add_argument("--approximate", action="store_true",
+                         help="Estimate project-wide n1/n2 with fixed-size sketches")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        if args.command == "analyze":
+            shard, _, count = args.shard.partition("/")
+            ignore = set(map(str.strip, args.ignore.split(","))) if args.ignore else set()
+            analyze_shard(args.project_dir, ignore, int(shard), int(count), args.output,
+                          args.include, args.exclude, args.jobs, args.cache, args.prefilter)
+        elif args.command == "merge":
+            shards.merge_shards(args.shards, args.output)
+        else:
+            reduce_shards(args.shards, args.output_dir, args.project_dir, args.live_format,
+                          args.report_format, args.compression, args.approximate)
+    except (shards.ShardError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
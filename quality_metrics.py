@@ -1,6 +1,6 @@
 import os
 import sys
-import csv
+import argparse
 from collections import Counter
 
 # === Setup paths ===
@@ -12,10 +12,17 @@ sys.path.append(METRICS_PATH)
 from halstead import run_halstead_analysis
 from information_flow import run_information_flow_analysis
 from live_variables import run_live_variable_analysis
+from analysis_engine import AnalysisCancelled
+from combined_reports import CombinedReports
+from sampling import SampledReports, plan_sample
+from progress import ProgressBus, console_sink, phase
+from timings import Timings, timing_phase
 from importlib import import_module
 
-# Dynamically import language detector from Metrics/parsers
+# Dynamically import language detector, file index and backends from Metrics/parsers
 language_detector = import_module("Metrics.parsers.language_detector")
+project_index = import_module("Metrics.parsers.project_index")
+registry = import_module("Metrics.parsers.registry")
 
 
 def get_user_input():
@@ -40,7 +47,18 @@ def get_user_input():
     return project_dir, ignore_dirs, halstead_csv, infoflow_csv, livevar_csv
 
 
-def run_quality_metrics(project_dir=None, ignore_dirs=None, output_dir=None):
+def run_quality_metrics(project_dir=None, ignore_dirs=None, output_dir=None, include=None, exclude=None,
+                        jobs=1, cache_path=None, live_format="lines", cancel_event=None,
+                        progress=None, index=None, prefilter="skip", report_format="csv",
+                        compression=None, timings=None, approximate=False, sample=None, time_budget=None,
+                        seed=0, confidence=0.95):
+    """Analyze every language of ``project_dir`` and write its reports.
+
+    With ``sample`` (a file count) and/or ``time_budget`` (seconds) only a
+    stratified random sample of the files is analyzed, and the combined
+    results gain a ``sample_estimate`` extrapolating project totals with
+    ``confidence`` intervals.
+    """
     if not project_dir:
         project_dir = input("Enter project directory: ").strip()
     if not ignore_dirs:
@@ -51,55 +69,75 @@ def run_quality_metrics(project_dir=None, ignore_dirs=None, output_dir=None):
 
     os.makedirs(output_dir, exist_ok=True)
 
-    # Detect all languages present and run each parser separately. Each
-    # language will write CSVs into a subfolder under output_dir.
-    langs = language_detector.detect_languages(project_dir)
+    # Walk the project once; the detector and every parser reuse this index.
+    # include/exclude are optional glob patterns on project-relative paths.
+    # Callers that already built an index for project_dir can pass it in.
+    if index is None:
+        with phase(progress, "index"), timing_phase(timings, "walk"):
+            index = project_index.ProjectIndex.build(project_dir, ignore_dirs, include, exclude)
+
+    plan = None
+    if sample or time_budget:
+        with phase(progress, "sample"), timing_phase(timings, "sample"):
+            plan = plan_sample(index, sample, time_budget, seed, jobs, prefilter)
+        print(f"Sampling {plan.sampled} of {plan.files} files in {len(plan.sizes)} strata")
+        index = plan.index
+
+    # Detect all languages present; each language writes its reports into
+    # a subfolder under output_dir.
+    with timing_phase(timings, "detect"):
+        langs = language_detector.detect_languages(project_dir, index=index)
     print(f"Detected languages: {langs}")
 
     if not langs:
         print("No recognizable source files found. Please provide a valid project directory.")
         return {}
 
+    # Cross-language reports are fed by every language as it runs, with a
+    # project total computed over all languages
+    if plan is not None:
+        combined_reports = SampledReports(plan, output_dir, live_format, report_format, compression,
+                                          approximate, confidence)
+    else:
+        combined_reports = CombinedReports(output_dir, live_format, report_format, compression, approximate)
+    # Every file goes to the one backend its extension maps to, and all
+    # languages share a single pass over the files
     all_results = {}
-    for lang in langs:
-        try:
-            parser_mod = import_module(f"Metrics.parsers.{lang}.parser")
-        except Exception as e:
-            print(f"Parser for language '{lang}' not found or failed to load: {e}")
-            all_results[lang] = {"error": str(e)}
-            continue
+    try:
+        with phase(progress, "languages"):
+            all_results = registry.run_languages(project_dir, ignore_dirs, output_dir, langs, index=index,
+                                                 jobs=jobs, cache_path=cache_path, live_format=live_format,
+                                                 cancel_event=cancel_event, progress=progress,
+                                                 prefilter=prefilter, report_format=report_format,
+                                                 compression=compression, combined=combined_reports,
+                                                 timings=timings, approximate=approximate,
+                                                 analyzed=plan.analyzed if plan is not None else None)
+    except AnalysisCancelled:
+        combined_reports.close()
+        raise
+    except Exception as e:
+        print(f"Error running metrics for {', '.join(langs)}: {e}")
+        all_results = {lang: {"error": str(e)} for lang in langs}
 
-        lang_output = os.path.join(output_dir, lang)
-        os.makedirs(lang_output, exist_ok=True)
+    print("\nAll analyses complete!")
+    return combine_results(all_results, combined_reports, prefilter, timings)
 
-        print(f"Running metrics using parser for: {lang}")
-        try:
-            results = parser_mod.run_metrics(project_dir, ignore_dirs, lang_output)
-            all_results[lang] = results
-        except Exception as e:
-            print(f"Error running parser for {lang}: {e}")
-            all_results[lang] = {"error": str(e)}
 
-    print("\nAll analyses complete!")
+def combine_results(all_results, combined_reports, prefilter="skip", timings=None):
+    """Add the ``combined`` entry to per-language results: summed counters
+    and summaries, and the cross-language reports of ``combined_reports``."""
     # Build combined metrics across all languages
     combined = {
         "total_ops": {},
         "total_opnds": {},
-        "variables": {},
-        "halstead_csv": os.path.join(output_dir, "combined_halstead.csv"),
-        "information_flow_csv": os.path.join(output_dir, "combined_information_flow.csv"),
-        "live_variables_csv": os.path.join(output_dir, "combined_live_variables.csv"),
+        "live_variables_summary": {"files": 0, "lines": 0, "max_live": 0},
+        "prefilter_summary": {"policy": prefilter, "skipped": {}, "sampled": {}},
     }
 
     # Aggregate counters
     ops_counter = Counter()
     opnds_counter = Counter()
 
-    # helpers to collect CSVs
-    halstead_files = []
-    infoflow_files = []
-    livevar_files = []
-
     for lang, res in all_results.items():
         if not isinstance(res, dict):
             continue
@@ -107,56 +145,95 @@ def run_quality_metrics(project_dir=None, ignore_dirs=None, output_dir=None):
             ops_counter.update(res.get("total_ops", {}))
         if res.get("total_opnds"):
             opnds_counter.update(res.get("total_opnds", {}))
-        if res.get("variables"):
-            # merge variable maps (file paths should be unique)
-            combined_vars = res.get("variables")
-            for p, vm in combined_vars.items():
-                combined["variables"][p] = vm
-
-        # collect csv paths if present
-        if res.get("halstead"):
-            halstead_files.append(res.get("halstead"))
-        if res.get("information_flow"):
-            infoflow_files.append(res.get("information_flow"))
-        if res.get("live_variables"):
-            livevar_files.append(res.get("live_variables"))
+        if res.get("live_variables_summary"):
+            summary = res["live_variables_summary"]
+            combined_summary = combined["live_variables_summary"]
+            combined_summary["files"] += summary["files"]
+            combined_summary["lines"] += summary["lines"]
+            combined_summary["max_live"] = max(combined_summary["max_live"], summary["max_live"])
+        if res.get("prefilter_summary"):
+            for action in ("skipped", "sampled"):
+                counts = Counter(combined["prefilter_summary"][action])
+                counts.update(res["prefilter_summary"][action])
+                combined["prefilter_summary"][action] = dict(counts)
 
     combined["total_ops"] = dict(ops_counter)
     combined["total_opnds"] = dict(opnds_counter)
-
-    # Function to concatenate CSVs with a header from the first file
-    def _concat_csvs(sources, dest_path):
-        if not sources:
-            return None
-        first = True
-        with open(dest_path, "w", newline="", encoding="utf-8") as out_f:
-            writer = None
-            for src in sources:
-                try:
-                    with open(src, "r", encoding="utf-8", errors="ignore") as in_f:
-                        reader = csv.reader(in_f)
-                        rows = list(reader)
-                        if not rows:
-                            continue
-                        header, data_rows = rows[0], rows[1:]
-                        if first:
-                            writer = csv.writer(out_f)
-                            writer.writerow(header)
-                            first = False
-                        for r in data_rows:
-                            writer.writerow(r)
-                except FileNotFoundError:
-                    continue
-        return dest_path
-
-    # write combined CSVs
-    _concat_csvs(halstead_files, combined["halstead_csv"]) if halstead_files else None
-    _concat_csvs(infoflow_files, combined["information_flow_csv"]) if infoflow_files else None
-    _concat_csvs(livevar_files, combined["live_variables_csv"]) if livevar_files else None
+    if combined_reports.approximate:
+        # Sketches only estimate each language; the union is estimated by
+        # the combined reports, which saw every file
+        combined["halstead_estimate"] = combined_reports.totals.estimate()
+
+    # Combined reports were written while each language ran
+    with timing_phase(timings, "reports"):
+        reports = combined_reports.finish()
+    combined["halstead_csv"] = reports["halstead"]
+    combined["information_flow_csv"] = reports["information_flow"]
+    combined["live_variables_csv"] = reports["live_variables"]
+    if "sample_estimate" in reports:
+        combined["sample_estimate_csv"] = reports["sample_estimate"]
+        combined["sample_estimate"] = combined_reports.estimate
 
     all_results["combined"] = combined
     return all_results
 
 
+def parse_args(argv=None):
+    """Command-line options; anything left out is prompted for interactively."""
+    parser = argparse.ArgumentParser(description="Run Qualitas quality metrics on a project.")
+    parser.add_argument("project_dir", nargs="?", help="Project directory to analyze")
+    parser.add_argument("--ignore", help="Comma-separated folder/file names to ignore")
+    parser.add_argument("--output-dir", help="Directory to save CSV reports")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Worker processes for per-file analysis (0 = one per CPU)")
+    parser.add_argument("--cache", metavar="PATH",
+                        help="SQLite file for reusing per-file results of unchanged files across runs")
+    parser.add_argument("--live-format", choices=("lines", "ranges"), default="lines",
+                        help="Live variable report layout: one row per line or per variable range")
+    parser.add_argument("--prefilter", choices=("skip", "sample", "off"), default="skip",
+                        help="Binary, minified and generated files: skip them, analyze a prefix, "
+                             "or analyze them in full")
+    parser.add_argument("--report-format", choices=("csv", "jsonl", "parquet"), default="csv",
+                        help="File format of the reports (Parquet needs pyarrow)")
+    parser.add_argument("--compression",
+                        help="Report compression: gzip for csv/jsonl, or a Parquet codec such as zstd")
+    parser.add_argument("--approximate", action="store_true",
+                        help="Estimate project-wide distinct operators/operands (n1/n2) with fixed-size "
+                             "sketches; totals carry n1_error/n2_error bounds")
+    parser.add_argument("--sample", type=int, metavar="FILES",
+                        help="Analyze a stratified random sample of this many files and estimate "
+                             "project totals with confidence intervals (at least 2 per language)")
+    parser.add_argument("--time-budget", type=float, metavar="SECONDS",
+                        help="Size the sample to finish in about this many seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the sample")
+    parser.add_argument("--confidence", type=float, default=0.95,
+                        help="Confidence level of the sample estimates")
+    parser.add_argument("--timings", action="store_true",
+                        help="Print time per phase and the slowest files at the end")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Do not print per-file progress")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    run_quality_metrics()
\ No newline at end of file
+    args = parse_args()
+    ignore = set(map(str.strip, args.ignore.split(","))) if args.ignore else None
+    bus = None if args.quiet else ProgressBus(console_sink(min_interval=1.0))
+    timings = Timings() if args.timings else None
+    try:
+        run_quality_metrics(args.project_dir, ignore, args.output_dir, jobs=args.jobs,
+                            cache_path=args.cache, live_format=args.live_format, progress=bus,
+                            prefilter=args.prefilter, report_format=args.report_format,
+                            compression=args.compression, timings=timings, approximate=args.approximate,
+                            sample=args.sample, time_budget=args.time_budget, seed=args.seed,
+                            confidence=args.confidence)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if timings is not None:
+        summary = timings.to_dict()
+        print(f"\nTotal {summary['total_sec']}s over {summary['files']} files")
+        for name, seconds in sorted(summary["phases"].items(), key=lambda p: p[1], reverse=True):
+            print(f"  {name:10} {seconds:9.3f}s")
+        print("Slowest files:")
+        for entry in summary["slowest_files"]:
+            print(f"  {entry['seconds']:9.4f}s  {entry['file']}")
\ No newline at end of file